@@ -0,0 +1,157 @@
+"""
+    gitdata adjacency
+
+    compressed sparse row snapshots of graph edges for analytics
+"""
+
+from array import array
+
+
+def zeros(n, typecode='l'):
+    """return an array of n zeros"""
+    return array(typecode, [0]) * n
+
+
+class Adjacency:
+    """Compressed Sparse Row Adjacency Snapshot
+
+    Nodes are numbered 0..n-1 in the order given.  The targets of the
+    edges leaving node i are targets[offsets[i]:offsets[i+1]].
+
+    >>> a = Adjacency(['a', 'b', 'c'], [('a', 'b'), ('a', 'c'), ('b', 'c')])
+    >>> list(a.offsets), list(a.targets)
+    ([0, 2, 3, 3], [1, 2, 2])
+    >>> a.successors('a')
+    ['b', 'c']
+    >>> a.degree_distribution()
+    {0: 1, 1: 1, 2: 1}
+
+    """
+
+    def __init__(self, nodes, edges):
+        self.nodes = list(nodes)
+        self.index = {node: n for n, node in enumerate(self.nodes)}
+
+        sources = array('l')
+        destinations = array('l')
+        index = self.index
+        for source, target in edges:
+            sources.append(index[source])
+            destinations.append(index[target])
+
+        n = len(self.nodes)
+        offsets = zeros(n + 1)
+        for source in sources:
+            offsets[source + 1] += 1
+        for i in range(n):
+            offsets[i + 1] += offsets[i]
+
+        targets = zeros(len(sources))
+        position = array('l', offsets[:n])
+        for source, target in zip(sources, destinations):
+            targets[position[source]] = target
+            position[source] += 1
+
+        self.offsets = offsets
+        self.targets = targets
+
+    def __len__(self):
+        return len(self.nodes)
+
+    @property
+    def edge_count(self):
+        """the number of edges"""
+        return len(self.targets)
+
+    def successors(self, node):
+        """return the nodes an edge leads to from node"""
+        i = self.index[node]
+        return [
+            self.nodes[t]
+            for t in self.targets[self.offsets[i]:self.offsets[i+1]]
+        ]
+
+    def out_degrees(self):
+        """return the out degree of each node"""
+        offsets = self.offsets
+        return array('l', (offsets[i+1] - offsets[i] for i in range(len(self))))
+
+    def in_degrees(self):
+        """return the in degree of each node"""
+        degrees = zeros(len(self))
+        for target in self.targets:
+            degrees[target] += 1
+        return degrees
+
+    def degree_distribution(self, reverse=False):
+        """return the number of nodes with each degree
+
+        Out degrees are counted unless reverse is True.
+        """
+        degrees = self.in_degrees() if reverse else self.out_degrees()
+        result = {}
+        for degree in degrees:
+            result[degree] = result.get(degree, 0) + 1
+        return dict(sorted(result.items()))
+
+    def transpose(self):
+        """return the snapshot with every edge reversed"""
+        return Adjacency(self.nodes, (
+            (self.nodes[self.targets[e]], self.nodes[i])
+            for i in range(len(self))
+            for e in range(self.offsets[i], self.offsets[i+1])
+        ))
+
+    def components(self):
+        """return the weakly connected components, largest first"""
+        parent = array('l', range(len(self)))
+
+        def root(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        offsets = self.offsets
+        targets = self.targets
+        for i in range(len(self)):
+            for e in range(offsets[i], offsets[i+1]):
+                a, b = root(i), root(targets[e])
+                if a != b:
+                    parent[max(a, b)] = min(a, b)
+
+        groups = {}
+        for i in range(len(self)):
+            groups.setdefault(root(i), []).append(self.nodes[i])
+        return sorted(groups.values(), key=len, reverse=True)
+
+    def pagerank(self, damping=0.85, tolerance=1.0e-8, iterations=100):
+        """return the PageRank of each node
+
+        Rank held by nodes without outgoing edges is spread evenly over
+        all the nodes.
+        """
+        n = len(self)
+        if not n:
+            return {}
+        offsets = self.offsets
+        targets = self.targets
+        degrees = self.out_degrees()
+        rank = array('d', [1.0 / n]) * n
+        for _ in range(iterations):
+            dangling = sum(rank[i] for i in range(n) if not degrees[i])
+            base = (1.0 - damping + damping * dangling) / n
+            new_rank = array('d', [base]) * n
+            for i in range(n):
+                if degrees[i]:
+                    share = damping * rank[i] / degrees[i]
+                    for e in range(offsets[i], offsets[i+1]):
+                        new_rank[targets[e]] += share
+            change = sum(abs(a - b) for a, b in zip(new_rank, rank))
+            rank = new_rank
+            if change < tolerance:
+                break
+        return dict(zip(self.nodes, rank))
+
+    def __repr__(self):
+        return 'Adjacency({} nodes, {} edges)'.format(len(self), self.edge_count)
@@ -93,6 +93,28 @@ class MySQLDatabase(Database):
     def transaction(self):
         return MySQLDatabaseTransaction(self)
 
+    def insert_many(self, table, names, rows, chunk_size=1000):
+        """insert rows into a table with an auto_increment id
+
+        Returns the ids of the new rows.  Rows are inserted with
+        multi-row inserts of up to chunk_size rows, for which InnoDB
+        allocates consecutive ids starting at LAST_INSERT_ID() in every
+        innodb_autoinc_lock_mode.
+        """
+        rows = list(rows)
+        slots = '(%s)' % ','.join(['%s'] * len(names))
+        ids = []
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start+chunk_size]
+            self(
+                'insert into {} ({}) values {}'.format(
+                    table, ', '.join(names), ','.join([slots] * len(chunk))
+                ),
+                *[value for row in chunk for value in row]
+            )
+            ids.extend(range(self.lastrowid, self.lastrowid + len(chunk)))
+        return ids
+
     def __del__(self):
         try:
             if self.open:
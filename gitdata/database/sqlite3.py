@@ -69,7 +69,7 @@ class Sqlite3Database(Database):
 
     def get_table_names(self):
         """return table names"""
-        cmd = 'select name from sqlite_master where type="table"'
+        cmd = "select name from sqlite_master where type='table'"
         return [a[0] for a in self(cmd)]
 
     @property
@@ -84,15 +84,68 @@ class Sqlite3Database(Database):
     def transaction(self):
         return Sqlite3DatabaseTransaction(self)
 
+    def insert_many(self, table, names, rows):
+        """insert rows into a table with an autoincrement id
+
+        Returns the ids of the new rows.  The ids are reserved by
+        advancing the sqlite_sequence entry of the table before the rows
+        are inserted, so the write lock is held from the start and the
+        ids of deleted rows are never used again.  Run it within a
+        transaction.
+        """
+        rows = list(rows)
+        if not rows:
+            return []
+        self(
+            'insert into sqlite_sequence (name, seq) select %s, 0 '
+            'where not exists (select 1 from sqlite_sequence where name=%s)',
+            table, table
+        )
+        self(
+            'update sqlite_sequence set seq=seq+%s where name=%s',
+            len(rows), table
+        )
+        last = self('select seq from sqlite_sequence where name=%s', table).first()[0]
+        ids = list(range(last - len(rows) + 1, last + 1))
+        self.execute_many(
+            'insert into {} (id, {}) values ({})'.format(
+                table, ', '.join(names), ','.join(['%s'] * (len(names) + 1))
+            ),
+            [(row_id,) + tuple(row) for row_id, row in zip(ids, rows)]
+        )
+        return ids
+
     def setup(self):
         """Setup GitData database"""
         self.run(gitdata.utils.libpath('database/sqlite3_setup.sql'))
+        self.migrate()
+
+    # set once the migrations have run on this connection
+    migrated = False
+
+    def migrate(self):
+        """Bring an existing GitData database up to the current schema
+
+        Adds any missing indexes in place without touching the data, so
+        it can be run against any database any number of times.  A
+        database that is not set up yet is left alone.
+        """
+        tables = self.get_table_names()
+        if 'entities' in tables and 'attributes' in tables:
+            self.run(gitdata.utils.libpath('database/sqlite3_migrate.sql'))
+            self.migrated = True
+
+    def get_index_names(self, table):
+        """return index names for a table"""
+        cmd = "select name from sqlite_master where type='index' and tbl_name=%s"
+        return [a[0] for a in self(cmd, table)]
 
 
 def setup_test_database():
     """Setup Testing Database"""
     db = Sqlite3Database()
     db.run(gitdata.utils.libpath('database/sqlite3_setup_test_data.sql'))
+    db.migrate()
     return db
 
 
@@ -0,0 +1,13 @@
+--
+-- Sqlite3 Entity Store Migrations
+--
+-- Safe to run against existing databases any number of times.
+--
+
+create index if not exists `entities_kind_key` on `entities` (`kind`);
+
+create index if not exists `attributes_row_id_key` on `attributes` (`row_id`);
+
+create index if not exists `attributes_kind_row_id_key` on `attributes` (`kind`, `row_id`);
+
+create index if not exists `attributes_kv` on `attributes` (`kind`, `attribute`, `value`);
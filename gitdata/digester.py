@@ -4,81 +4,410 @@
     digests aribtrary data structures into facts
 """
 
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import io
+import itertools
+import os
+import timeit
+
 import gitdata
 
+containers = (dict, list, tuple, set)
+
+
+def is_iterator(value):
+    """return True if value is an iterator to be digested like a list
+
+    >>> is_iterator(iter([1])), is_iterator([1]), is_iterator(io.BytesIO())
+    (True, False, False)
+
+    """
+    return isinstance(value, Iterator) and not isinstance(value, io.IOBase)
+
+
+def has_iterators(data):
+    """return True if data is or contains an iterator
+
+    >>> has_iterators(dict(a=[1, 2])), has_iterators(dict(a=[iter([1])]))
+    (False, True)
+
+    """
+    stack = [data]
+    while stack:
+        obj = stack.pop()
+        if is_iterator(obj):
+            return True
+        if isinstance(obj, dict):
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple)):
+            stack.extend(obj)
+    return False
+
+
+def items_of(data):
+    """return the (predicate, object) pairs of a container
+
+    Set members are sorted by token so they are digested in the same
+    order whatever the hash seed.
+
+    >>> list(items_of({'b', 'a'}))
+    [('includes', 'a'), ('includes', 'b')]
+
+    """
+    if isinstance(data, dict):
+        return iter(data.items())
+    if isinstance(data, set):
+        data = sorted(data, key=token)
+    return (('includes', item) for item in data)
+
+
+def token(value):
+    """return bytes that identify a value and its type"""
+    if isinstance(value, io.BytesIO):
+        value = value.getvalue()
+    text = ('%s:%r' % (type(value).__name__, value)).encode('utf8')
+    return b'%d:' % len(text) + text
+
+
+def content_hashes(data):
+    """return the content hash of every container in data, by id
+
+    Hashes are computed bottom up with an explicit stack, so identical
+    containers get identical hashes however deeply they are nested.
+    """
+    hashes = {}
+    if not isinstance(data, containers):
+        return hashes
+    stack = [(data, False)]
+    while stack:
+        obj, children_done = stack.pop()
+        if id(obj) in hashes:
+            continue
+        if not children_done:
+            stack.append((obj, True))
+            for _, o in items_of(obj):
+                if isinstance(o, containers) and id(o) not in hashes:
+                    stack.append((o, False))
+        else:
+            h = hashlib.blake2b(b'd' if isinstance(obj, dict) else b'l', digest_size=16)
+            for p, o in items_of(obj):
+                h.update(token(p))
+                if isinstance(o, containers):
+                    h.update(b'#' + hashes[id(o)])
+                else:
+                    h.update(token(o))
+            hashes[id(obj)] = h.digest()
+    return hashes
+
 
 class Digester(object):
-    """Digest arbitrary data structures into facts"""
+    """Digest arbitrary data structures into facts
 
-    def __init__(self, data=None, new_uid=gitdata.utils.new_uid):
+    Data is walked with an explicit stack rather than by recursion so
+    deeply nested data can be digested, and facts can be generated as
+    they are found instead of being collected first.
+    """
+
+    def __init__(
+            self, data=None, new_uid=gitdata.utils.new_uid, share=False,
+            stable=False, records=None, min_records=100, rows=None,
+            seconds=None):
         self.known = []
+        self.uid = None
+        self.roots = []
         self.new_uid = new_uid
+        self.share = share
+        self.stable = stable
+        self.records = records
+        self.min_records = min_records
+        self.rows = rows
+        self.seconds = seconds
         if data:
             self.digest(data)
 
-    def _digest(self, known, data):
-        """digest some data"""
+    def _sampled(self, iterator, deadline):
+        """return the items of an iterator within the budgets"""
+        if self.share or self.stable:
+            raise Exception('iterators can not be digested with share or stable')
+        items = itertools.islice(iterator, self.rows)
+        if deadline is not None:
+            items = itertools.takewhile(
+                lambda _: timeit.default_timer() < deadline, items
+            )
+        return items
+
+    def _tabular(self, data):
+        """return the keys of a list of records that all have them"""
+        if (
+                self.records is None or self.share
+                or not isinstance(data, (list, tuple))
+                or len(data) < self.min_records
+                or not isinstance(data[0], dict)):
+            return None
+        keys = tuple(data[0])
+        if not all(isinstance(key, str) for key in keys):
+            return None
+        for row in data:
+            if not isinstance(row, dict) or tuple(row) != keys:
+                return None
+            if any(isinstance(value, containers) for value in row.values()):
+                return None
+        return keys
+
+    def _add_records(self, uid, data, keys, hashes, path):
+        """pass a list of records to the records function"""
+        rows = []
+        for position, row in enumerate(data):
+            if self.stable:
+                row_path = self._path(path, data, position, 'includes')
+                row_uid = self._new_uid(hashes[id(row)], row_path)
+            else:
+                row_uid = self.new_uid()
+            rows.append((row_uid, tuple(row.values())))
+        self.records(uid, keys, rows)
+
+    def _new_uid(self, content, path):
+        """return the uid for a new container"""
+        if not self.stable:
+            return self.new_uid()
+        if self.share:
+            return content.hex()
+        return hashlib.blake2b(path + content, digest_size=16).hexdigest()
 
-        if isinstance(data, dict):
-            s = self.new_uid()
-            for p, o in data.items():
-                known.append((s, p, self._digest(known, o)))
-            return s
+    @staticmethod
+    def _path(path, container, position, predicate):
+        """return the path hash of an item of a container"""
+        if not isinstance(container, dict):
+            predicate = position
+        return hashlib.blake2b(path + token(predicate), digest_size=16).digest()
 
-        elif isinstance(data, (list, tuple, set)):
-            s = self.new_uid()
-            for item in data:
-                known.append((s, 'includes', self._digest(known, item)))
-            return s
+    def facts(self, data):
+        """generate the facts of some data
 
+        The uid of the root of the data is available as self.uid once
+        the generator has started.  With share, identical containers
+        are digested once and every occurrence refers to the same uid.
+        With stable, uids are 32 character hashes of the content and the
+        path of keys and list positions to it rather than new uids, so
+        digesting the same data again produces the same facts, and parts
+        of the data that have not changed keep their uids.
+
+        Lists of at least min_records dicts with the same keys and no
+        nested values are passed to the records function, if there is
+        one, as (uid, keys, rows) instead of being generated as facts.
+
+        Iterators such as generators are digested like lists, reading
+        items only as they are needed.  At most rows items are read from
+        each iterator, and no more items are read once seconds have
+        passed, so endless iterators can be sampled.
+        """
+        if self.seconds is None:
+            deadline = None
         else:
-            return data
+            deadline = timeit.default_timer() + self.seconds
+
+        if is_iterator(data):
+            data = self._sampled(data, deadline)
+        elif not isinstance(data, containers):
+            self.uid = data
+            return
+
+        hashes = content_hashes(data) if self.share or self.stable else None
+        seen = {}
+
+        self.uid = self._new_uid(hashes and hashes[id(data)], b'')
+        keys = self._tabular(data)
+        if keys is not None:
+            self._add_records(self.uid, data, keys, hashes, b'')
+            return
+        if self.share:
+            seen[hashes[id(data)]] = self.uid
+        stack = [(self.uid, data, enumerate(items_of(data)), None, b'')]
+        while stack:
+            s, container, items, parent, path = stack[-1]
+            for position, (p, o) in items:
+                if is_iterator(o):
+                    o = self._sampled(o, deadline)
+                if isinstance(o, containers) or is_iterator(o):
+                    content = hashes and hashes[id(o)]
+                    if self.share and content in seen:
+                        yield (s, p, seen[content])
+                        continue
+                    if self.stable:
+                        child_path = self._path(path, container, position, p)
+                    else:
+                        child_path = None
+                    uid = self._new_uid(content, child_path)
+                    if self.share:
+                        seen[content] = uid
+                    keys = self._tabular(o)
+                    if keys is not None:
+                        self._add_records(uid, o, keys, hashes, child_path)
+                        yield (s, p, uid)
+                        continue
+                    stack.append((uid, o, enumerate(items_of(o)), (s, p), child_path))
+                    break
+                yield (s, p, o)
+            else:
+                stack.pop()
+                if parent:
+                    yield parent + (s,)
+
+    def batches(self, data, size=1000):
+        """generate the facts of some data in lists of up to size facts"""
+        return batched(self.facts(data), size)
+
+    def parallel_batches(self, data, workers=None, chunk_size=10000):
+        """generate the facts of a list digested by a pool of processes
+
+        The list is split into chunks of chunk_size items which are
+        digested in separate processes using new_uid from gitdata.utils,
+        whose uids do not collide across processes.  The facts of each
+        chunk are generated as one batch, in the same order digesting
+        the list in one process would produce.  Only a few chunks per
+        worker are in progress at a time.
+        """
+        if self.stable:
+            raise Exception('stable uids are not supported with workers')
+        self.uid = self.new_uid()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            window = 2 * (workers or os.cpu_count() or 1)
+            running = deque()
+            for start in range(0, len(data), chunk_size):
+                chunk = list(data[start:start+chunk_size])
+                running.append(
+                    executor.submit(digest_chunk, self.uid, chunk, self.share)
+                )
+                if len(running) >= window:
+                    yield running.popleft().result()
+            while running:
+                yield running.popleft().result()
+
+    def parsed(self, events):
+        """generate the facts of a stream of parse events
+
+        Events are (kind, value) pairs as generated by
+        gitdata.json.events.  Facts and uids come out in the same order
+        as they would for the parsed data.  The uid of each top level
+        value is appended to self.roots.
+        """
+        self.roots = []
+        stack = []
+        for kind, value in events:
+            if kind == 'value':
+                if stack:
+                    yield (stack[-1][0], stack[-1][1], value)
+                else:
+                    self.roots.append(value)
+            elif kind == 'map_key':
+                stack[-1][1] = value
+            elif kind in ('start_map', 'start_array'):
+                uid = self.new_uid()
+                parent = tuple(stack[-1][:2]) if stack else None
+                if parent is None:
+                    self.roots.append(uid)
+                predicate = 'includes' if kind == 'start_array' else None
+                stack.append([uid, predicate, parent])
+            else:
+                uid, _, parent = stack.pop()
+                if parent:
+                    yield parent + (uid,)
 
     def digest(self, data):
         """digest some data"""
-        known = []
-        uid = self._digest(known, data)
-        self.known = known
-        return uid
+        self.known = list(self.facts(data))
+        return self.uid
 
 
 class Undigester(object):
-    """Convert facts into data structures"""
+    """Convert facts into data structures
+
+    Facts are indexed by subject once, a container is created for each
+    subject and then filled, replacing objects that are subjects with
+    their containers.  The roots are the subjects no other fact refers
+    to.
+    """
 
     def __init__(self, facts=None):
         self.objects = {}
+        self.roots = []
         if facts:
             self.undigest(facts)
 
-    def _undigest(self, facts, data):
+    def undigest(self, facts):
         """undigest some facts"""
-
+        index = {}
         for s, p, o in facts:
-            if p == 'includes':
-                data.setdefault(s, []).append(o)
-            else:
-                data.setdefault(s, {})[p] = o
+            index.setdefault(s, []).append((p, o))
 
-        result = data.copy()
+        objects = self.objects = {
+            s: [] if all(p == 'includes' for p, _ in pairs) else {}
+            for s, pairs in index.items()
+        }
 
-        for k, v in data.items():
-            if isinstance(v, list):
-                result[k] = [result.pop(i, i) for i in v]
+        referenced = set()
+        for s, pairs in index.items():
+            container = objects[s]
+            for p, o in pairs:
+                try:
+                    value = objects.get(o, o)
+                except TypeError:
+                    value = o
+                if value is not o:
+                    referenced.add(o)
+                if isinstance(container, list):
+                    container.append(value)
+                else:
+                    container[p] = value
 
-        for k, v in result.items():
-            if isinstance(v, dict):
-                for p, o in v.items():
-                    if o in result:
-                        v[p] = result.get(o)
+        self.roots = [s for s in index if s not in referenced]
+        if self.roots:
+            return objects[self.roots[0]]
+        if objects:
+            return objects[next(iter(objects))]
+        return None
 
-        return result
 
-    def undigest(self, facts):
-        """undigest some facts"""
-        data = {}
-        result = self._undigest(facts, data)
-        keys = list(result.keys())
-        return result.pop(keys[0]) if keys else None
+def record_facts(uid, attributes, rows):
+    """generate the facts of a list of records passed to a records function
+
+    >>> list(record_facts('1', ('name',), [('2', ('Joe',)), ('3', (None,))]))
+    [('2', 'name', 'Joe'), ('1', 'includes', '2'), ('1', 'includes', '3')]
+
+    """
+    for row_uid, values in rows:
+        for attribute, value in zip(attributes, values):
+            if value is not None:
+                yield (row_uid, attribute, value)
+        yield (uid, 'includes', row_uid)
+
+
+def digest_chunk(root, items, share=False):
+    """return the facts of items of a list whose uid is root"""
+    digester = Digester(share=share)
+    facts = list(digester.facts(items))
+    chunk = digester.uid
+    return [(root, p, o) if s == chunk else (s, p, o) for s, p, o in facts]
+
+
+def batched(facts, size=1000):
+    """group facts into lists of up to size facts
+
+    >>> list(batched(range(5), 2))
+    [[0, 1], [2, 3], [4]]
+
+    """
+    batch = []
+    for fact in facts:
+        batch.append(fact)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
 
 def digested(data, new_uid=gitdata.utils.new_uid):
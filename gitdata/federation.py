@@ -0,0 +1,73 @@
+"""
+    gitdata federation
+
+    run graph queries across several fact stores in parallel
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+from gitdata.graphs import Graph
+
+
+def query_location(location, clauses, where=None, limit=None):
+    """Run a query against the graph stored at a location"""
+    graph = Graph(location)
+    try:
+        return graph.query(clauses, where=where, limit=limit)
+    finally:
+        graph.facts.connection.close()
+
+
+class FederatedGraph:
+    """Federated Graph
+
+    Runs the same query against the fact stores of several graph
+    locations, such as the .gitdata directories of repositories, in a
+    pool of processes and merges the results in location order.
+    """
+
+    def __init__(self, locations, workers=None):
+        self.locations = list(locations)
+        self.workers = workers
+        self.executor = None
+
+    def _executor(self):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self.executor
+
+    def query(self, clauses, where=None, limit=None):
+        """Query every location
+
+        The limit is passed to each location so none returns more
+        results than are needed, and locations not yet started are
+        skipped once the limit is reached.
+        """
+        executor = self._executor()
+        futures = [
+            executor.submit(query_location, location, clauses, where, limit)
+            for location in self.locations
+        ]
+        results = []
+        for n, future in enumerate(futures):
+            results.extend(future.result())
+            if limit is not None and len(results) >= limit:
+                for pending in futures[n+1:]:
+                    pending.cancel()
+                return results[:limit]
+        return results
+
+    def close(self):
+        """Shut down the worker processes"""
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __repr__(self):
+        return 'FederatedGraph({!r})'.format(self.locations)
@@ -3,12 +3,18 @@
 """
 
 import base64
+from collections import Counter, OrderedDict
 import datetime
 from decimal import Decimal
+import itertools
+import timeit
 from datetime import datetime, date
 
 import gitdata
-from gitdata.digester import digested, undigested
+import gitdata.json
+from gitdata.adjacency import Adjacency
+from gitdata.digester import Digester, Undigester, batched, record_facts
+from gitdata.stores.common import is_variable, is_parameter, compare, merge_diff
 from gitdata.stores.facts import facts_of
 
 def retype(value, value_type):
@@ -68,92 +74,645 @@ def retype(value, value_type):
     return value
 
 
-# class Node:
-#     """Graph Node"""
+class NodeCache:
+    """Facts about graph nodes read in batches
 
-#     graph = None
-#     uid = None
+    Maps each node uid to a list of (attribute, value) pairs.  String
+    values of loaded nodes may refer to other nodes; they are kept as
+    pending and read along with the next batch, so related nodes are
+    loaded one level per lookup rather than one node per lookup.
+    """
 
-#     def __init__(self, **kwargs):
-#         self.__dict__.update(kwargs)
+    def __init__(self, graph):
+        self.graph = graph
+        self.facts = {}
+        self.pending = []
 
-#     def add(self, relation, data):
-#         """Add a related data to a node"""
-#         uid = self.graph.add(data)
-#         self.graph.store.add([(self.uid, relation, uid)])
-#         return uid
+    def load(self, uids):
+        """Read the facts about nodes that aren't already cached"""
+        wanted = []
+        for uid in list(uids) + self.pending:
+            if uid not in self.facts:
+                self.facts[uid] = []
+                wanted.append(uid)
+        self.pending = []
+        if wanted:
+            for s, p, o in self.graph.facts.matching_any((wanted, None, None)):
+                self.facts[s].append((p, o))
+            self.pending = [
+                o for uid in wanted for _, o in self.facts[uid]
+                if isinstance(o, str) and o not in self.facts
+            ]
+        return self
 
-#     def delete(self):
-#         """Delete all facts related to a node"""
-#         self.graph.store.remove(
-#             self.graph.matching((self.uid, None, None))
-#         )
+    def __getitem__(self, uid):
+        if uid not in self.facts:
+            self.load([uid])
+        return self.facts[uid]
 
-#     def __getitem__(self, name):
-#         values = self.graph.matching((self.uid, name, None))
-#         return values[0][-1] if values else None
+    def pop(self, uid):
+        """Forget the facts about a node"""
+        self.facts.pop(uid, None)
 
-#     def __getattr__(self, name):
-#         values = self.graph.matching((self.uid, name, None))
-#         return values[0][-1] if values else None
 
-#     def keys(self):
-#         for k, _ in self.items():
-#             yield k
+class Node:
+    """Lazy Graph Node
 
-#     def values(self):
-#         for _, v in self.items():
-#             yield v
+    The facts about a node are read from the graph the first time they
+    are needed.  Values that refer to other nodes are returned as Nodes
+    sharing the same NodeCache, so related nodes are read in batches.
+    """
 
-#     def items(self):
-#         for _, p, o in self.graph.matching((self.uid, None, None)):
-#             if self.graph.get(o):
-#                 o = Node(graph=self.graph, uid=o)
-#             result = p, o
-#             yield result
+    def __init__(self, graph, uid, cache=None):
+        self.graph = graph
+        self.uid = uid
+        self.cache = NodeCache(graph) if cache is None else cache
 
-#     def __eq__(self, value):
-#         return dict(self.items()) == dict(value)
+    def _facts(self):
+        return self.cache[self.uid]
 
-#     def __iter__(self):
-#         members = self.graph.query([
-#             (self.uid, None, '_a'),
-#             ('_a', 'includes', '?uid')
-#         ])
-#         if members:
-#             for member in members:
-#                 yield Node(graph=self.graph, **member)
+    def _wrap(self, values):
+        """Return values with references to other nodes as Nodes"""
+        return [
+            Node(self.graph, v, self.cache)
+            if isinstance(v, str) and self.cache[v] else v
+            for v in values
+        ]
+
+    @property
+    def is_list(self):
+        """True if the node holds a list of members"""
+        facts = self._facts()
+        return bool(facts) and all(p == 'includes' for p, _ in facts)
+
+    def add(self, relation, data):
+        """Add related data to a node"""
+        uid = self.graph.add(data) if isinstance(data, (dict, list, tuple, set)) else data
+        self.graph.insert([(self.uid, relation, uid)])
+        self.cache.pop(self.uid)
+        return uid
+
+    def delete(self):
+        """Delete all facts about a node"""
+        self.graph.delete((self.uid, None, None))
+        self.cache.pop(self.uid)
+
+    def get(self, name, default=None):
+        for p, o in self._facts():
+            if p == name:
+                return self._wrap([o])[0]
+        return default
+
+    def __getitem__(self, name):
+        if isinstance(name, int) and self.is_list:
+            return list(self)[name]
+        missing = object()
+        value = self.get(name, missing)
+        if value is missing:
+            raise KeyError(name)
+        return value
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self.get(name)
+
+    def keys(self):
+        return [p for p, _ in self._facts()]
+
+    def values(self):
+        return self._wrap([o for _, o in self._facts()])
+
+    def items(self):
+        return list(zip(self.keys(), self.values()))
+
+    def __contains__(self, name):
+        return name in self.keys()
+
+    def __len__(self):
+        return len(self._facts())
+
+    def __iter__(self):
+        if self.is_list:
+            return iter(self.values())
+        return iter(self.keys())
+
+    def __eq__(self, other):
+        try:
+            if self.is_list:
+                return list(self) == list(other)
+            return dict(self.items()) == dict(other)
+        except (TypeError, ValueError):
+            return False
+
+    def __repr__(self):
+        return 'Node({!r})'.format(self.uid)
+
+
+class Step:
+    """A single clause of a query plan"""
+
+    def __init__(self, clause, bound, parameters=True):
+        self.clause = clause
+        self.pattern = []
+        self.slots = []
+        self.bpos = {}
+        self.same = []
+        for pos, term in enumerate(clause):
+            if is_variable(term):
+                self.pattern.append(None)
+                if term in self.bpos:
+                    self.same.append((self.bpos[term], pos))
+                else:
+                    self.bpos[term] = pos
+            elif parameters and is_parameter(term):
+                self.pattern.append(None)
+                self.slots.append((pos, term[1:]))
+            else:
+                self.pattern.append(term)
+        self.keys = [(var, pos) for var, pos in self.bpos.items() if var in bound]
+        self.new = [(var, pos) for var, pos in self.bpos.items() if var not in bound]
+        self.conditions = []
+        self.checks = []
+        self.parameters = parameters
+
+    def resolve(self, operand, params):
+        """Fill in a filter operand that refers to a parameter slot"""
+        if self.parameters and is_parameter(operand):
+            name = operand[1:]
+            if name not in params:
+                raise Exception('missing query parameter: ' + repr(name))
+            return params[name]
+        if isinstance(operand, (list, tuple)):
+            return type(operand)(self.resolve(item, params) for item in operand)
+        return operand
+
+    def rows(self, facts, params):
+        """Return the facts matching this step"""
+        pattern = list(self.pattern)
+        for pos, name in self.slots:
+            if name not in params:
+                raise Exception('missing query parameter: ' + repr(name))
+            pattern[pos] = params[name]
+        if self.conditions:
+            where = [
+                (op, self.resolve(operand, params))
+                for op, operand in self.conditions
+            ]
+            rows = facts.matching(tuple(pattern), where=where)
+        else:
+            rows = facts.matching(tuple(pattern))
+        if self.same or self.checks:
+            checks = [
+                (pos, op, self.resolve(operand, params))
+                for pos, op, operand in self.checks
+            ]
+            rows = [
+                row for row in rows
+                if all(row[a] == row[b] for a, b in self.same)
+                and all(compare(row[pos], op, operand) for pos, op, operand in checks)
+            ]
+        return rows
+
+    def accepts(self, row, params=None):
+        """Return True if a fact matches this step"""
+        params = params or {}
+        pattern = list(self.pattern)
+        for pos, name in self.slots:
+            pattern[pos] = params[name]
+        return (
+            all(term is None or term == value for term, value in zip(pattern, row))
+            and all(row[a] == row[b] for a, b in self.same)
+            and all(
+                compare(row[2], op, self.resolve(operand, params))
+                for op, operand in self.conditions
+            )
+            and all(
+                compare(row[pos], op, self.resolve(operand, params))
+                for pos, op, operand in self.checks
+            )
+        )
+
+    def start(self, rows):
+        """Generate the bindings of a first step"""
+        for row in rows:
+            yield dict((var, row[pos]) for var, pos in self.bpos.items())
+
+    def describe(self):
+        """Return a description of the step"""
+        return dict(
+            clause=tuple(self.clause),
+            pattern=tuple(self.pattern),
+            parameters=[name for _, name in self.slots],
+            joins=[var for var, _ in self.keys],
+            binds=[var for var, _ in self.new],
+            pushed=list(self.conditions),
+            checks=[(self.clause[pos], op, operand) for pos, op, operand in self.checks],
+        )
+
+    def join(self, bindings, rows):
+        """Join bindings with rows on the variables they share"""
+        index = None
+        for binding in bindings:
+            if index is None:
+                index = {}
+                for row in rows():
+                    key = tuple(row[pos] for _, pos in self.keys)
+                    index.setdefault(key, []).append(row)
+            key = tuple(binding[var] for var, _ in self.keys)
+            for row in index.get(key, ()):
+                result = binding.copy()
+                for var, pos in self.new:
+                    result[var] = row[pos]
+                yield result
+
+
+def _count(total, _):
+    return total + 1
+
+
+def _is_number(value):
+    return isinstance(value, (int, float, Decimal))
+
+
+def _rank(value):
+    """sort key that puts numbers before other values, as SQL does"""
+    if _is_number(value):
+        return 0, value
+    return 1, str(value)
+
+
+def _sum(total, value):
+    """add numbers, skipping other values as SQL does"""
+    if not _is_number(value):
+        return total
+    if isinstance(value, bool):
+        value = int(value)
+    if total is None:
+        return value
+    if isinstance(total, float) or isinstance(value, float):
+        return float(total) + float(value)
+    return total + value
+
+
+def _min(least, value):
+    return value if least is None or _rank(value) < _rank(least) else least
+
+
+def _max(most, value):
+    return value if most is None or _rank(value) > _rank(most) else most
+
+
+aggregate_functions = {
+    'count': (0, _count),
+    'sum': (None, _sum),
+    'min': (None, _min),
+    'max': (None, _max),
+}
+
+
+def aggregated(bindings, group_by=None, aggregates=None):
+    """Aggregate a stream of bindings
+
+    Each binding is folded into the running totals of its group as it
+    arrives so the bindings are never held in memory together.
+    """
+    group_by = list(group_by or [])
+    aggregates = dict(aggregates or {})
+    for function, _ in aggregates.values():
+        if function not in aggregate_functions:
+            raise Exception('unsupported aggregate: ' + repr(function))
+
+    names = list(aggregates)
+    specs = [
+        (aggregate_functions[function][1], variable)
+        for function, variable in aggregates.values()
+    ]
+    initial = [aggregate_functions[function][0] for function, _ in aggregates.values()]
+
+    groups = {}
+    for binding in bindings:
+        key = tuple(binding.get(var) for var in group_by)
+        totals = groups.get(key)
+        if totals is None:
+            totals = groups[key] = list(initial)
+        for n, (fold, variable) in enumerate(specs):
+            value = binding.get(variable) if variable else None
+            if value is not None or fold is _count:
+                totals[n] = fold(totals[n], value)
+
+    if not group_by:
+        totals = groups.get((), initial)
+        return dict(zip(names, totals))
+
+    return [
+        dict(
+            [(var[1:], value) for var, value in zip(group_by, key)] +
+            list(zip(names, totals))
+        )
+        for key, totals in groups.items()
+    ]
+
+
+class Query:
+    """Prepared Graph Query
+
+    The clauses are parsed into a plan once so the query can be run
+    repeatedly.  Terms starting with '$' are parameter slots that are
+    filled in when the query is run.  Results are cached by parameter
+    values until the fact store changes, keeping the cache_size most
+    recently used.
+    """
+
+    cache_size = 128
+
+    def __init__(self, graph, clauses, parameters=True, where=None):
+        self.graph = graph
+        self.clauses = list(clauses)
+        self.where = list(where or [])
+        self.steps = []
+        self.cache = OrderedDict()
+        self.version = None
+        bound = set()
+        for clause in self.clauses:
+            step = Step(clause, bound, parameters)
+            bound.update(step.bpos)
+            self.steps.append(step)
+        for variable, op, operand in self.where:
+            self.attach(variable, op, operand)
+
+    def attach(self, variable, op, operand):
+        """Attach a filter to the steps that can apply it earliest
+
+        Filters on variables that are the object of a clause are passed
+        to the fact store scan for that clause.  Otherwise the filter is
+        applied to the rows of the first clause that binds the variable.
+        """
+        steps = [step for step in self.steps if variable in step.bpos]
+        if not steps:
+            raise Exception('unknown query variable: ' + repr(variable))
+        pushed = False
+        for step in steps:
+            if step.bpos[variable] == 2:
+                step.conditions.append((op, operand))
+                pushed = pushed or step is steps[0]
+        if not pushed:
+            steps[0].checks.append((steps[0].bpos[variable], op, operand))
+
+    @property
+    def parameters(self):
+        """The names of the parameter slots"""
+        return sorted(set(name for step in self.steps for _, name in step.slots))
+
+    def bindings(self, params):
+        """Generate the raw variable bindings"""
+        facts = self.graph.facts
+        if not self.steps:
+            return iter([])
+        first = self.steps[0]
+        bindings = first.start(first.rows(facts, params))
+        for step in self.steps[1:]:
+            rows = lambda step=step: step.rows(facts, params)
+            bindings = step.join(bindings, rows)
+        return bindings
+
+    def execute(self, params, limit=None):
+        """Run the query without caching
+
+        With a limit the query stops once that many results are found.
+        """
+        return [
+            dict(
+                (k[1:], v)
+                for k, v in b.items()
+                if k[0] == '?'
+            ) for b in itertools.islice(self.bindings(params), limit)
+        ]
+
+    def explain(self, profile=False, **params):
+        """Return a report describing how the query is run
+
+        With profile the query is also run, one step at a time, and the
+        report includes the rows fetched, the bindings remaining and the
+        seconds spent matching facts and joining for each step.
+        """
+        report = dict(
+            clauses=[tuple(clause) for clause in self.clauses],
+            where=[tuple(condition) for condition in self.where],
+            steps=[step.describe() for step in self.steps],
+        )
+        if not profile:
+            return report
+
+        timer = timeit.default_timer
+        facts = self.graph.facts
+        started = timer()
+        bindings = None
+        for step, stats in zip(self.steps, report['steps']):
+            begin = timer()
+            if bindings is None or bindings:
+                rows = list(step.rows(facts, params))
+            else:
+                rows = []
+            fetched = timer()
+            if bindings is None:
+                bindings = list(step.start(rows))
+            else:
+                bindings = list(step.join(bindings, lambda: rows))
+            joined = timer()
+            stats.update(
+                rows=len(rows),
+                bindings=len(bindings),
+                matching=fetched - begin,
+                joining=joined - fetched,
+            )
+        report.update(
+            results=len(bindings or []),
+            elapsed=timer() - started,
+        )
+        return report
+
+    def run(self, **params):
+        """Run the query, using cached results when possible"""
+        version = self.graph.facts.version
+        if version != self.version:
+            self.cache.clear()
+            self.version = version
+        try:
+            key = tuple(sorted(params.items()))
+            hash(key)
+        except TypeError:
+            return self.execute(params)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+        else:
+            self.cache[key] = self.execute(params)
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return [dict(b) for b in self.cache[key]]
+
+    __call__ = run
+
+    def __repr__(self):
+        return 'Query({!r})'.format(self.clauses)
+
+
+class Without:
+    """Facts of a store less some facts that are in it"""
 
-#         if self.graph.matching((self.uid, 'includes', None)):
-#             for _, _, o in self.graph.matching((self.uid, 'includes', None)):
-#                 yield Node(graph=self.graph, uid=o)
-#         return self.keys()
+    def __init__(self, facts, excluded):
+        self.facts = facts
+        self.excluded = Counter(excluded)
 
-#     def __str__(self):
+    def matching_any(self, pattern):
+        excluded = self.excluded.copy()
+        for fact in self.facts.matching_any(pattern):
+            if excluded[fact] > 0:
+                excluded[fact] -= 1
+            else:
+                yield fact
+
+
+def bind_join(step, bindings, facts):
+    """Join bindings with the facts matching a step that relate to them"""
+    shared = [(var, pos) for var, pos in step.bpos.items() if var in bindings[0]]
+    new = [(var, pos) for var, pos in step.bpos.items() if var not in bindings[0]]
+    terms = [None if term is None else [term] for term in step.pattern]
+    for var, pos in shared:
+        values = set(binding[var] for binding in bindings)
+        if None not in values:
+            terms[pos] = list(values)
+            break
+    index = {}
+    for row in facts.matching_any(terms):
+        if step.accepts(row):
+            key = tuple(row[pos] for _, pos in shared)
+            index.setdefault(key, []).append(row)
+    result = []
+    for binding in bindings:
+        for row in index.get(tuple(binding[var] for var, _ in shared), ()):
+            joined = binding.copy()
+            for var, pos in new:
+                joined[var] = row[pos]
+            result.append(joined)
+    return result
+
+
+def delta_bindings(steps, delta, facts):
+    """Generate the bindings of steps that use at least one delta fact
+
+    The delta facts must be in the store.  Each binding is generated
+    once: steps before the one a delta fact starts from see the whole
+    store, and steps after it see the store without the delta.
+    """
+    without = Without(facts, delta)
+    for i, step in enumerate(steps):
+        rows = [row for row in delta if step.accepts(row)]
+        if not rows:
+            continue
+        bindings = list(step.start(rows))
+        for j, other in enumerate(steps):
+            if j == i or not bindings:
+                continue
+            bindings = bind_join(other, bindings, facts if j < i else without)
+        yield from bindings
+
+
+class View:
+    """Materialized Graph View
+
+    Holds the results of a query and keeps them up to date as facts
+    are added to and removed from the graph.  Changes are applied
+    incrementally: for each clause the changed facts match, the changed
+    facts are joined with the rest of the clauses, looking up only the
+    facts related to them.
+    """
+
+    def __init__(self, graph, clauses, where=None):
+        self.graph = graph
+        self.query = Query(graph, clauses, parameters=False, where=where)
+        self.variables = []
+        for step in self.query.steps:
+            for var in step.bpos:
+                if var[0] == '?' and var not in self.variables:
+                    self.variables.append(var)
+        self.counts = Counter()
+        self.results = None
+        self.refresh()
+
+    def _key(self, binding):
+        return tuple(binding[var] for var in self.variables)
+
+    def refresh(self):
+        """Recompute the view from scratch"""
+        self.counts = Counter(
+            self._key(binding) for binding in self.query.bindings({})
+        )
+        self.results = None
+
+    def changed(self, delta, sign):
+        """Apply facts added (sign 1) or about to be removed (sign -1)
+
+        The delta facts must be in the store when this is called.
+        """
+        if not delta:
+            return
+        for binding in delta_bindings(self.query.steps, delta, self.graph.facts):
+            self.counts[self._key(binding)] += sign
+        self.counts = +self.counts
+        self.results = None
+
+    def __iter__(self):
+        return iter(self.rows())
+
+    def rows(self):
+        """Return the view results"""
+        if self.results is None:
+            names = [var[1:] for var in self.variables]
+            self.results = [
+                dict(zip(names, key))
+                for key, count in self.counts.items()
+                for _ in range(count)
+            ]
+        return [dict(row) for row in self.results]
+
+    def __len__(self):
+        return sum(self.counts.values())
+
+
+class Rule:
+    """Graph Inference Rule
 
-#         members = [o for s, p, o in self.graph.matching((self.uid, 'includes', None))]
-#         if members:
-#             return repr(tuple(Node(graph=self.graph, uid=n) for n in members))
+    Derives the head fact for each solution of the body clauses.
 
-#         name = '{}({})'.format(
-#             self.__class__.__name__,
-#             self.uid
-#         )
+    >>> rule = Rule(('?a', 'ancestor', '?c'), [
+    ...     ('?a', 'parent', '?b'),
+    ...     ('?b', 'ancestor', '?c'),
+    ... ])
+    >>> list(rule.derive([{'?a': 'x', '?b': 'y', '?c': 'z'}]))
+    [('x', 'ancestor', 'z')]
 
-#         t = ['  {} {}: {!r}'.format(
-#             key,
-#             '.'*(20-len(key[:20])),
-#             value,
-#         ) for key, value in self.items()]
+    """
 
-#         return '\n'.join([name] + t)
+    def __init__(self, head, body, where=None):
+        self.head = tuple(head)
+        self.body = list(body)
+        self.where = list(where or [])
+        bound = set(term for clause in self.body for term in clause if is_variable(term))
+        for term in self.head:
+            if is_variable(term) and term not in bound:
+                raise Exception('unbound rule variable: ' + repr(term))
 
-#     def __repr__(self):
-#         # pattern = (self.uid, None, None)
-#         members = [o for s, p, o in self.graph.matching((self.uid, 'includes', None))]
-#         if members:
-#             return repr(tuple(Node(graph=self.graph, uid=n) for n in members))
-#         return f'Node({self.uid})'
+    def derive(self, bindings):
+        """Generate the head facts for bindings of the body"""
+        for binding in bindings:
+            yield tuple(
+                binding[term] if is_variable(term) else term
+                for term in self.head
+            )
+
+    def __repr__(self):
+        return 'Rule({!r}, {!r})'.format(self.head, self.body)
 
 
 class Graph:
@@ -162,22 +721,142 @@ class Graph:
     def __init__(self, location=None, new_uid=gitdata.utils.new_uid):
         self.facts = facts_of(location, new_uid=new_uid)
         self.new_uid = new_uid
+        self.views = {}
 
     def setup(self):
         self.facts.setup()
+        self._refresh_views()
+
+    def insert(self, facts):
+        """Add facts to the graph, keeping views up to date"""
+        facts = [fact for fact in facts if fact[-1] is not None]
+        self.facts.add(facts)
+        for view in self.views.values():
+            view.changed(facts, 1)
+
+    def remove(self, facts):
+        """Remove facts from the graph, keeping views up to date"""
+        facts = list(facts)
+        for view in self.views.values():
+            view.changed(facts, -1)
+        self.facts.remove(facts)
+
+    def add(
+            self, data, batch_size=1000, share=False, stable=False,
+            workers=None, rows=None, seconds=None):
+        """Add data to the graph and return the uid of its root node
+
+        Facts are written to the store in batches as they are digested
+        so the whole fact list is never held in memory.  With share,
+        identical parts of the data are stored once.  With stable, uids
+        are derived from the data and facts already in the graph are
+        skipped, so adding the same data again changes nothing.  With
+        workers, a list longer than batch_size is digested in chunks of
+        batch_size items by that many processes.
+
+        Otherwise, stores that support it keep long lists of records with
+        the same keys in record tables rather than as separate facts.
+
+        Iterators in the data are read lazily as lists.  At most rows
+        items are read from each and reading stops after seconds.
+        """
+        records = None
+        if not (share or stable or workers) and hasattr(self.facts, 'add_records'):
+            records = self._add_records
+        digester = Digester(
+            new_uid=self.new_uid, share=share, stable=stable,
+            records=records,
+            min_records=getattr(self.facts, 'min_records', None),
+            rows=rows, seconds=seconds,
+        )
+        if workers and isinstance(data, (list, tuple)) and len(data) > batch_size:
+            batches = digester.parallel_batches(data, workers, batch_size)
+        else:
+            batches = digester.batches(data, batch_size)
+        for batch in batches:
+            if stable:
+                batch = self.facts.missing(batch)
+            if batch:
+                self.insert(batch)
+        return digester.uid
+
+    def _add_records(self, uid, attributes, rows):
+        """Add a list of records to the record tables of the store"""
+        self.facts.add_records(uid, attributes, rows)
+        if self.views:
+            facts = list(record_facts(uid, attributes, rows))
+            for view in self.views.values():
+                view.changed(facts, 1)
 
-    def add(self, data):
-        """Add data to the graph"""
-        return self.facts.add(digested(data, new_uid=self.new_uid))
+    def ingest(self, stream, batch_size=1000):
+        """Add the JSON or JSON Lines text read from a stream
+
+        The text is parsed and digested incrementally and the facts are
+        written in batches, so documents of any size are loaded in
+        bounded memory.  Returns the uids of the top level values.
+        """
+        digester = Digester(new_uid=self.new_uid)
+        facts = digester.parsed(gitdata.json.events(stream))
+        for batch in batched(facts, batch_size):
+            self.insert(batch)
+        return digester.roots
 
     def clear(self):
         """Remove all facts from the graph"""
         self.facts.clear()
+        self._refresh_views()
 
     def delete(self, pattern):
         """Delete all facts matching the pattern"""
-        facts = self.facts.matching(pattern)
-        self.facts.remove(facts)
+        self.remove(self.facts.matching(pattern))
+
+    def diff(self, other):
+        """Generate the changes that turn this graph into another
+
+        Yields ('+', fact) for facts only in other and ('-', fact) for
+        facts only in this graph.  Both stores are read once in order.
+        """
+        return merge_diff(self.facts.ordered(), other.facts.ordered())
+
+    def merge(self, other, batch_size=1000):
+        """Add the facts of another graph that this graph lacks
+
+        Returns the number of facts added.
+        """
+        total = 0
+        batch = []
+        for change, fact in self.diff(other):
+            if change == '+':
+                batch.append(fact)
+                if len(batch) >= batch_size:
+                    self.insert(batch)
+                    total += len(batch)
+                    batch = []
+        if batch:
+            self.insert(batch)
+            total += len(batch)
+        return total
+
+    def _refresh_views(self):
+        for view in self.views.values():
+            view.refresh()
+
+    def create_view(self, name, clauses, where=None):
+        """Create a materialized view of a query
+
+        The view is computed once and then updated incrementally as
+        facts are added or removed through the graph.
+        """
+        view = self.views[name] = View(self, clauses, where=where)
+        return view
+
+    def drop_view(self, name):
+        """Remove a materialized view"""
+        self.views.pop(name, None)
+
+    def view(self, name):
+        """Return the results of a materialized view"""
+        return self.views[name].rows()
 
     def get(self, uids):
         """Get a node of the graph"""
@@ -198,61 +877,281 @@ class Graph:
                 return result
             return result[0]
 
-    def query(self, clauses):
-        """Query the graph"""
-        facts = self.facts
-        bindings = None
-        for clause in clauses:
-            bpos = {}
-            qc = []
-            for pos, x in enumerate(clause):
-                if isinstance(x, str) and (x.startswith('?') or x.startswith('_')):
-                    qc.append(None)
-                    bpos[x] = pos
+    def load(self, uid, depth=None):
+        """Rebuild the data rooted at a node
+
+        The facts are read one level at a time, one batched lookup per
+        level, following only values that may refer to nodes.  With
+        depth, nodes more than depth levels below the root are left as
+        uids.
+        """
+        facts = []
+        seen = {uid}
+        frontier = [uid]
+        level = 0
+        while frontier and (depth is None or level <= depth):
+            found = list(self.facts.matching_any((frontier, None, None)))
+            facts.extend(found)
+            frontier = []
+            for _, _, o in found:
+                if isinstance(o, str) and o not in seen:
+                    seen.add(o)
+                    frontier.append(o)
+            level += 1
+        undigester = Undigester()
+        undigester.undigest(facts)
+        return undigester.objects.get(uid)
+
+    def prepare(self, clauses, where=None):
+        """Prepare a query for repeated use"""
+        return Query(self, clauses, where=where)
+
+    def query(self, clauses, where=None, limit=None):
+        """Query the graph
+
+        The optional where filters are (variable, operator, operand)
+        triples, for example ('?age', 'between', (20, 30)).  The optional
+        limit is the most results to return.
+        """
+        query = Query(self, clauses, parameters=False, where=where)
+        return query.execute({}, limit=limit)
+
+    def _expand(self, frontier, predicates=None, reverse=False):
+        """Expand a frontier of nodes with one batched lookup
+
+        Returns the facts read and the (node, neighbor) edges that were
+        followed.
+        """
+        if reverse:
+            facts = list(self.facts.matching_any((None, predicates, frontier)))
+            edges = [(o, s) for s, _, o in facts]
+        else:
+            facts = list(self.facts.matching_any((frontier, None, None)))
+            edges = [
+                (s, o) for s, p, o in facts
+                if isinstance(o, str) and (predicates is None or p in predicates)
+            ]
+        return facts, edges
+
+    def neighbors(self, uids, predicates=None, reverse=False):
+        """Return the nodes one step away from the given nodes
+
+        Only edges with the given predicates are followed if predicates
+        are specified.  With reverse the incoming edges are followed.
+        """
+        if not isinstance(uids, (list, tuple, set)):
+            uids = [uids]
+        seen = set()
+        result = []
+        for _, node in self._expand(list(uids), predicates, reverse)[1]:
+            if node not in seen:
+                seen.add(node)
+                result.append(node)
+        return result
+
+    def traverse(self, start, depth=None, predicates=None, reverse=False):
+        """Return the subgraph reachable from the start nodes
+
+        The graph is explored breadth first, expanding a whole frontier
+        per lookup.  A depth of 0 returns just the facts about the start
+        nodes, 1 adds the facts about their neighbors and so on.  With
+        no depth the traversal continues until nothing new is reached.
+        """
+        if not isinstance(start, (list, tuple, set)):
+            start = [start]
+        frontier = list(start)
+        seen = set(frontier)
+        result = Graph(new_uid=self.new_uid)
+        result.setup()
+        level = 0
+        while frontier:
+            facts, edges = self._expand(frontier, predicates, reverse)
+            result.facts.add(facts)
+            if depth is not None and level >= depth:
+                break
+            frontier = []
+            for _, node in edges:
+                if node not in seen:
+                    seen.add(node)
+                    frontier.append(node)
+            level += 1
+        return result
+
+    def path(self, start, end, predicates=None, reverse=False):
+        """Return the nodes along a shortest path from start to end"""
+        parents = {start: None}
+        frontier = [start]
+        while frontier and end not in parents:
+            _, edges = self._expand(frontier, predicates, reverse)
+            frontier = []
+            for node, neighbor in edges:
+                if neighbor not in parents:
+                    parents[neighbor] = node
+                    frontier.append(neighbor)
+        if end not in parents:
+            return None
+        result = [end]
+        while parents[result[-1]] is not None:
+            result.append(parents[result[-1]])
+        return result[::-1]
+
+    def infer(self, rules, batch_size=1000):
+        """Add the facts rules derive until nothing new can be derived
+
+        Rules are evaluated semi-naively: the first round runs each rule
+        against the whole graph and later rounds only join the facts
+        derived in the round before.  Returns the number of facts added.
+        """
+        queries = [
+            (rule, Query(self, rule.body, parameters=False, where=rule.where))
+            for rule in rules
+        ]
+        total = 0
+        delta = None
+        while True:
+            candidates = set()
+            for rule, query in queries:
+                if delta is None:
+                    bindings = query.bindings({})
                 else:
-                    qc.append(x)
-            rows = list(facts.matching((qc[0], qc[1], qc[2])))
-            # print(rows)
-            if bindings is None:
-                # This is the first pass, everything matches
-                bindings = []
-                for row in rows:
-                    binding = {}
-                    for var, pos in bpos.items():
-                        binding[var] = row[pos]
-                    bindings.append(binding)
-            else:
-                # in subsequent passes, eliminate bindings that dont work
-                newb = []
-                for binding in bindings:
-                    for row in rows:
-                        validmatch = True
-                        tempbinding = binding.copy()
-                        for var, pos in bpos.items():
-                            if var in tempbinding:
-                                if tempbinding[var] != row[pos]:
-                                    validmatch = False
-                            else:
-                                tempbinding[var] = row[pos]
-                        if validmatch:
-                            newb.append(tempbinding)
-                bindings = newb
-        return [
-            dict(
-                (k[1:], v)
-                for k, v in b.items()
-                if k[0] == '?'
-            ) for b in bindings
-        ] if bindings else []
+                    bindings = delta_bindings(query.steps, delta, self.facts)
+                candidates.update(rule.derive(bindings))
+            delta = self._novel(candidates)
+            if not delta:
+                return total
+            for start in range(0, len(delta), batch_size):
+                self.insert(delta[start:start+batch_size])
+            total += len(delta)
+
+    def _novel(self, facts):
+        """Return the facts not already in the graph"""
+        if not facts:
+            return []
+        existing = set(self.facts.matching_any((
+            set(fact[0] for fact in facts),
+            set(fact[1] for fact in facts),
+            None,
+        )))
+        return sorted((fact for fact in facts if fact not in existing), key=repr)
+
+    def explain(self, clauses, where=None, profile=False):
+        """Explain how a query is run
+
+        Returns a report of the query plan.  With profile the query is
+        run and the report includes the cardinality and timings of each
+        step, for example for logging slow queries.
+        """
+        query = Query(self, clauses, parameters=False, where=where)
+        return query.explain(profile=profile)
+
+    def aggregate(self, clauses, group_by=None, where=None, **aggregates):
+        """Aggregate query results
+
+        Aggregates are given as name=(function, variable) where function
+        is one of count, sum, min or max.  Results are grouped by the
+        group_by variables, or a single dict is returned if there are
+        none.  Stores that can aggregate natively do the work themselves.
+        """
+        aggregate = getattr(self.facts, 'aggregate', None)
+        if aggregate is not None:
+            return aggregate(clauses, group_by, aggregates, where)
+        query = Query(self, clauses, parameters=False, where=where)
+        return aggregated(query.bindings({}), group_by, aggregates)
+
+    def to_adjacency(self, predicates=None, edges=None):
+        """Return a compressed sparse row snapshot of the graph edges
+
+        By default the edges are the facts whose value is another node
+        of the graph, optionally limited to the given predicates.  With
+        edges=(source, target), every node with both attributes is an
+        edge between their values instead, as in a list of links.
+        """
+        if edges:
+            source, target = edges
+            pairs = [
+                (b['source'], b['target'])
+                for b in self.query([
+                    ('_edge', source, '?source'),
+                    ('_edge', target, '?target'),
+                ])
+            ]
+            nodes = {}
+            for a, b in pairs:
+                nodes.setdefault(a, None)
+                nodes.setdefault(b, None)
+            return Adjacency(nodes, pairs)
+
+        nodes = {}
+        candidates = []
+        for s, p, o in self.facts.matching((None, None, None)):
+            nodes.setdefault(s, None)
+            if isinstance(o, str) and (predicates is None or p in predicates):
+                candidates.append((s, o))
+        return Adjacency(nodes, [(s, o) for s, o in candidates if o in nodes])
+
+    def _members(self, uids, cache):
+        """Load nodes, replacing list nodes with their loaded members"""
+        result = []
+        seen = set()
+        while uids:
+            cache.load(uids)
+            members = []
+            for uid in uids:
+                if uid in seen:
+                    continue
+                seen.add(uid)
+                facts = cache[uid]
+                if facts and all(p == 'includes' for p, _ in facts):
+                    members.extend(o for _, o in facts if isinstance(o, str))
+                elif facts:
+                    result.append(uid)
+            uids = members
+        return result
+
+    def node(self, uid):
+        """Return a lazy node"""
+        return Node(self, uid)
+
+    def nodes(self, uids, prefetch=None):
+        """Return lazy nodes, loading related nodes in batches
+
+        Each prefetch entry names an attribute, or a dotted path of
+        attributes such as 'projects.owner', whose related nodes are
+        loaded with one lookup per level rather than one per node.
+        Lists along the way are loaded along with their members, and
+        string values of the loaded nodes are resolved in one more
+        lookup, so reading the prefetched nodes needs no further lookups.
+        """
+        uids = list(uids)
+        cache = NodeCache(self).load(uids)
+        for path in prefetch or []:
+            current = uids
+            for name in path.split('.'):
+                targets = [
+                    o for uid in current for p, o in cache[uid]
+                    if p == name and isinstance(o, str)
+                ]
+                current = self._members(targets, cache)
+        # resolve the string values still pending so reading them does not
+        # need another lookup to tell plain strings from node uids
+        cache.load([])
+        return [Node(self, uid, cache) for uid in uids if cache[uid]]
+
+    def find(self, *args, prefetch=None, **kwargs):
+        """Find nodes
 
-    def find(self, *args, **kwargs):
-        """Find nodes"""
+        Nodes are returned as dicts unless prefetch is given, in which
+        case they are returned as lazy Nodes with the related nodes
+        named in prefetch already loaded.
+        """
         query = []
         for i in args:
             query.append(('?subject', i, '?'+i))
         for k, v in kwargs.items():
             query.append(('?subject', k, v))
         subjects = set(record['subject'] for record in self.query(query))
+        if prefetch is not None:
+            return self.nodes(sorted(subjects), prefetch)
         if subjects:
             return self.get(subjects) or []
         return []
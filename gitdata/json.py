@@ -4,8 +4,10 @@
     JSON with extra converters
 """
 
+import io
 import json
 import datetime
+import re
 from decimal import Decimal
 from datetime import datetime, date
 
@@ -14,25 +16,154 @@ def decode_datetime(text):
     return datetime.fromisoformat(text)
 
 
+def dhandler(obj):
+    """handles extra converters"""
+    # pylint: disable=invalid-name
+    if '__type__' in obj:
+        t = obj['__type__']
+        if t == 'datetime':
+            return decode_datetime(obj['value'])
+        elif t == 'date':
+            return datetime.strptime(obj['value'], '%Y-%m-%d').date()
+        elif t == 'decimal':
+            return Decimal(str(obj['value']))
+        elif t == 'bytes':
+            return obj['value'].encode("utf-8")
+    return obj
+
+
 def loads(text):
     """load JSON from a string"""
+    return json.loads(text, object_hook=dhandler)
 
-    def dhandler(obj):
-        """handles extra converters"""
-        # pylint: disable=invalid-name
-        if '__type__' in obj:
-            t = obj['__type__']
-            if t == 'datetime':
-                return decode_datetime(obj['value'])
-            elif t == 'date':
-                return datetime.strptime(obj['value'], '%Y-%m-%d').date()
-            elif t == 'decimal':
-                return Decimal(str(obj['value']))
-            elif t == 'bytes':
-                return obj['value'].encode("utf-8")
-        return obj
 
-    return json.loads(text, object_hook=dhandler)
+decoder = json.JSONDecoder(object_hook=dhandler)
+
+whitespace = re.compile(r'[ \t\n\r]*')
+
+typed = re.compile(r'\{[ \t\n\r]*"__type__"')
+
+
+def events(stream, size=65536):
+    """Generate parse events from a stream of JSON text
+
+    The text is read size characters at a time and parsed one token at
+    a time, so only the current token is held in memory.  Events are
+    (kind, value) pairs where kind is one of start_map, map_key,
+    end_map, start_array, end_array or value.  A stream may hold
+    several values one after another, as JSON Lines does.  Objects
+    written by dumps for extra types are returned as single values.
+    Malformed text raises ValueError.
+
+    >>> list(events(io.StringIO('{"a": [1, true]} "b"')))
+    [('start_map', None), ('map_key', 'a'), ('start_array', None), ('value', 1), ('value', True), ('end_array', None), ('end_map', None), ('value', 'b')]
+
+    >>> list(events(io.StringIO('[1 2]')))
+    Traceback (most recent call last):
+    ...
+    ValueError: expected ',' or ']' at 3
+
+    """
+    buffer = ''
+    pos = 0
+    eof = False
+    containers = []
+    expect_key = False
+    expect = 'value'    # one of value, separator or colon
+    empty = False
+
+    def closer():
+        return '}' if containers[-1] == 'map' else ']'
+
+    while True:
+        pos = whitespace.match(buffer, pos).end()
+        if pos + 64 > len(buffer) and not eof:
+            chunk = stream.read(size)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+        if pos == len(buffer):
+            break
+
+        c = buffer[pos]
+        if expect == 'colon' and c != ':':
+            raise ValueError("expected ':' at %d" % pos)
+        if expect == 'separator' and c not in ',}]':
+            raise ValueError("expected ',' or %r at %d" % (closer(), pos))
+
+        if c in '{[' and not (c == '{' and typed.match(buffer, pos)):
+            if expect_key:
+                raise ValueError('expected a key at %d' % pos)
+            containers.append('map' if c == '{' else 'array')
+            expect_key = c == '{'
+            empty = True
+            pos += 1
+            yield ('start_map' if c == '{' else 'start_array'), None
+        elif c in '}]':
+            if (
+                not containers
+                or c != closer()
+                or (expect == 'value' and not empty)
+            ):
+                raise ValueError('unexpected %r at %d' % (c, pos))
+            containers.pop()
+            expect_key = False
+            expect = 'separator' if containers else 'value'
+            empty = False
+            pos += 1
+            yield ('end_map' if c == '}' else 'end_array'), None
+        elif c == ',':
+            if expect != 'separator':
+                raise ValueError('unexpected %r at %d' % (c, pos))
+            expect_key = containers[-1] == 'map'
+            expect = 'value'
+            empty = False
+            pos += 1
+        elif c == ':':
+            if expect != 'colon':
+                raise ValueError('unexpected %r at %d' % (c, pos))
+            expect = 'value'
+            pos += 1
+        else:
+            try:
+                value, end = decoder.scan_once(buffer, pos)
+                complete = end < len(buffer) or eof
+            except (StopIteration, json.JSONDecodeError):
+                if eof:
+                    raise ValueError('invalid JSON at %d' % pos)
+                complete = False
+            if not complete:
+                chunk = stream.read(size)
+                eof = not chunk
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                continue
+            if c == '{' and isinstance(value, dict):
+                # a __type__ object of a type dhandler does not know
+                # is an ordinary map
+                if expect_key:
+                    raise ValueError('expected a key at %d' % pos)
+                containers.append('map')
+                expect_key = True
+                empty = True
+                pos += 1
+                yield 'start_map', None
+                continue
+            pos = end
+            empty = False
+            if expect_key:
+                if not isinstance(value, str):
+                    raise ValueError('expected a key at %d' % pos)
+                expect_key = False
+                expect = 'colon'
+                yield 'map_key', value
+            else:
+                expect = 'separator' if containers else 'value'
+                yield 'value', value
+
+    if containers or expect == 'colon':
+        raise ValueError('unexpected end of JSON')
 
 
 def dumps(data, *a, **k):
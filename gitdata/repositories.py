@@ -12,6 +12,7 @@ import shutil
 from gitdata.connectors.common import (
     get
 )
+from gitdata.digester import has_iterators
 from gitdata.graphs import Graph
 from gitdata.utils import parents
 
@@ -63,6 +64,9 @@ def add_connection_metadata(facts, **kwargs):
 class Repository:
     """Gitdata Repository"""
 
+    # items read from each iterator when fetch is given no budget
+    fetch_rows = 100
+
     def __init__(self, location=':memory:'):
         if location == ':memory:':
             self.location = location
@@ -76,10 +80,21 @@ class Repository:
     def setup(self):
         self.graph.setup()
 
-    def fetch(self, ref):
-        """Fetch a ref"""
+    def fetch(self, ref, rows=None, seconds=None):
+        """Fetch a ref
+
+        Data is added with stable uids, so fetching the same data again
+        adds nothing.  Data containing iterators, such as the endless
+        lists of the fake connector, can not be hashed up front, so it
+        is added with new uids instead, reading at most rows items from
+        each iterator for at most seconds, or fetch_rows items if neither
+        is given.
+        """
         data = get(ref)
-        self.graph.add(data)
+        stable = not has_iterators(data)
+        if not stable and rows is None and seconds is None:
+            rows = self.fetch_rows
+        self.graph.add(data, stable=stable, rows=rows, seconds=seconds)
         return data
 
         # self.facts = digested(facts)
@@ -3,8 +3,10 @@
 """
 
 import base64
+from collections import Counter
 from datetime import datetime, date
 from decimal import Decimal
+import operator
 
 
 def retype(value, value_type):
@@ -119,9 +121,118 @@ def get_type_str(value):
         return t
 
 
+def is_variable(term):
+    """Return True if a query clause term is a variable
+
+    >>> is_variable('?name'), is_variable('_a'), is_variable('name')
+    (True, True, False)
+
+    """
+    return isinstance(term, str) and term[:1] in ('?', '_')
+
+
+def is_parameter(term):
+    """Return True if a query clause term is a parameter slot"""
+    return isinstance(term, str) and term[:1] == '$'
+
+
+comparisons = {
+    '=': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+
+def comparable(value, operand):
+    """return value and operand in a form that can be compared
+
+    Dates compared against datetimes are treated as midnight.
+
+    >>> comparable(date(2019, 5, 1), datetime(2019, 5, 1, 12))
+    (datetime.datetime(2019, 5, 1, 0, 0), datetime.datetime(2019, 5, 1, 12, 0))
+
+    """
+    def promoted(a):
+        if isinstance(a, date) and not isinstance(a, datetime):
+            return datetime(a.year, a.month, a.day)
+        return a
+    if isinstance(value, datetime) or isinstance(operand, datetime):
+        return promoted(value), promoted(operand)
+    return value, operand
+
+
+def compare(value, op, operand):
+    """compare a value using a filter operator
+
+    Supports the comparison operators plus 'between', which takes a
+    (low, high) pair and is inclusive, and 'in', which takes a
+    collection.  Values that can't be compared don't match.
+
+    >>> compare(25, 'between', (20, 30))
+    True
+    >>> compare('Joe', '>', 5)
+    False
+
+    """
+    try:
+        if op == 'between':
+            low, high = operand
+            return compare(value, '>=', low) and compare(value, '<=', high)
+        if op == 'in':
+            return any(compare(value, '=', item) for item in operand)
+        if op not in comparisons:
+            raise Exception('unsupported operator: ' + repr(op))
+        return comparisons[op](*comparable(value, operand))
+    except TypeError:
+        return False
+
+
+def fact_key(fact):
+    """Return a key that orders facts the same way in every store
+
+    Facts are ordered by entity and attribute, then by value type and
+    the representation of the value so values of any type can be sorted.
+
+    >>> sorted([('b', 'x', 1), ('a', 'y', 'z'), ('a', 'x', 2)], key=fact_key)
+    [('a', 'x', 2), ('a', 'y', 'z'), ('b', 'x', 1)]
+
+    """
+    entity, attribute, value = fact
+    return entity, attribute, get_type_str(value), repr(value)
+
+
+def merge_diff(old, new):
+    """Generate the changes between two streams of facts ordered by fact_key
+
+    Yields ('-', fact) for facts only in old and ('+', fact) for facts
+    only in new, in one pass over each stream.
+
+    >>> list(merge_diff([('a', 'x', 1), ('b', 'x', 1)], [('b', 'x', 1), ('c', 'x', 1)]))
+    [('-', ('a', 'x', 1)), ('+', ('c', 'x', 1))]
+
+    """
+    old, new = iter(old), iter(new)
+    end = object()
+    a, b = next(old, end), next(new, end)
+    while a is not end or b is not end:
+        if b is end or (a is not end and fact_key(a) < fact_key(b)):
+            yield '-', a
+            a = next(old, end)
+        elif a is end or fact_key(b) < fact_key(a):
+            yield '+', b
+            b = next(new, end)
+        else:
+            a, b = next(old, end), next(new, end)
+
+
 class AbstractStore:
     """Abstract Fact Store"""
 
+    version = 0
+
     def add(self, facts):
         """add facts to the entity store"""
 
@@ -131,6 +242,29 @@ class AbstractStore:
     def matching(self, pattern):
         """return facts that match the pattern"""
 
+    def matching_any(self, pattern):
+        """return facts matching any of the values given for each term"""
+
+    def ordered(self):
+        """return all facts in fact_key order"""
+
+    def missing(self, facts):
+        """return the facts that are not already stored
+
+        A fact given twice is only found if it is stored twice.
+        """
+        facts = list(facts)
+        existing = Counter(
+            self.matching_any((set(fact[0] for fact in facts), None, None))
+        )
+        result = []
+        for fact in facts:
+            if existing[fact] > 0:
+                existing[fact] -= 1
+            else:
+                result.append(fact)
+        return result
+
     def put(self, entity):
         """put an entity into the entity store"""
 
@@ -37,71 +37,94 @@ Record = gitdata.utils.Record
 RecordList = gitdata.utils.RecordList
 
 
-def entify(rs, storage):
-    """
-    converts query result into an EntityList
-    """
-    klass = storage.klass
-    entities = {}
+def decode_unicode(value):
+    """decode a unicode attribute value"""
+    if isinstance(value, str):
+        return value
+    return value.decode('utf8')
 
-    if hasattr(rs, 'data'):  # maintain backward compatibility with
-        rs = rs.data         # legacy database module
 
-    for _, _, row_id, attribute, datatype, value in rs:
+def decode_date(value):
+    """decode a date attribute value"""
+    return datetime.date(int(value[:4]), int(value[5:7]), int(value[8:10]))
 
-        if datatype == 'str':
-            pass
 
-        elif datatype == 'unicode' and isinstance(value, str):
-            pass
+def decode_datetime(value):
+    """decode a datetime attribute value"""
+    return datetime.datetime(
+        int(value[:4]), int(value[5:7]), int(value[8:10]),
+        int(value[11:13]), int(value[14:16]), int(value[17:19])
+    )
 
-        elif datatype == 'unicode':
-            value = value.decode('utf8')
 
-        elif datatype == "int":
-            value = int(value)
+def decode_bool(value):
+    """decode a bool attribute value"""
+    return value == '1' or value == 'True'
 
-        elif datatype == 'float':
-            value = float(value)
 
-        elif datatype == 'decimal.Decimal':
-            value = decimal.Decimal(value)
+def decode_none(_):
+    """decode a NoneType attribute value"""
+    return None
 
-        elif datatype == "datetime.date":
-            y = int(value[:4])
-            m = int(value[5:7])
-            d = int(value[8:10])
-            value = datetime.date(y, m, d)
 
-        elif datatype == "datetime.datetime":
-            y = int(value[:4])
-            m = int(value[5:7])
-            d = int(value[8:10])
-            hr = int(value[11:13])
-            mn = int(value[14:16])
-            sc = int(value[17:19])
-            value = datetime.datetime(y, m, d, hr, mn, sc)
+def decode_tuple(value):
+    """decode a tuple attribute value"""
+    return tuple(gitdata.json.loads(value))
 
-        elif datatype == 'bool':
-            value = (value == '1' or value == 'True')
 
-        elif datatype == 'NoneType':
-            value = None
+# attribute value decoders by datatype, None where no decoding is needed
+decoders = {
+    'str': None,
+    'unicode': decode_unicode,
+    'int': int,
+    'float': float,
+    'decimal.Decimal': decimal.Decimal,
+    'datetime.date': decode_date,
+    'datetime.datetime': decode_datetime,
+    'bool': decode_bool,
+    'NoneType': decode_none,
+    'bytes': base64.b64decode,
+    'list': gitdata.json.loads,
+    'tuple': decode_tuple,
+}
 
-        elif datatype == 'bytes':
-            value = base64.b64decode(value)
 
-        elif datatype == 'list':
-            value = gitdata.json.loads(value)
+def chunked(keys, size):
+    """split a list of keys into lists of up to size keys
 
-        elif datatype == 'tuple':
-            value = tuple(gitdata.json.loads(value))
+    >>> list(chunked([1, 2, 3, 4, 5], 2))
+    [[1, 2], [3, 4], [5]]
 
-        else:
+    """
+    keys = list(keys)
+    for start in range(0, len(keys), size):
+        yield keys[start:start+size]
+
+
+def entify(rs, storage):
+    """
+    converts query result into an EntityList
+    """
+    klass = storage.klass
+    entities = {}
+
+    if hasattr(rs, 'data'):  # maintain backward compatibility with
+        rs = rs.data         # legacy database module
+
+    for _, _, row_id, attribute, datatype, value in rs:
+
+        try:
+            decode = decoders[datatype]
+        except KeyError:
             msg = 'unsupported data type: ' + repr(datatype)
             raise UnsupportedTypeException(msg)
+        if decode is not None:
+            value = decode(value)
 
-        entities.setdefault(row_id, klass(_id=row_id, __store=storage))[attribute] = value
+        entity = entities.get(row_id)
+        if entity is None:
+            entity = entities[row_id] = klass(_id=row_id, __store=storage)
+        entity[attribute] = value
 
     return RecordList(entities.values())
 
@@ -239,6 +262,62 @@ class EntityStore(Store):
         self.kind = kind or type(klass) == str and klass or gitdata.utils.kind(klass())
         self.id_name = '_id'
 
+        # bring databases made before the current schema up to date
+        if not getattr(self.db, 'migrated', True):
+            self.db.migrate()
+
+    # keys per IN list, well under the 999 variables older SQLite allows
+    chunk_size = 500
+
+    @staticmethod
+    def _encoded(entity):
+        """return the attributes, values, datatypes and encoded values"""
+        def fixval(d):
+            if type(d) == datetime.datetime:
+                # avoids mysqldb reliance on strftime that lacks support
+                # for dates before 1900
+                return "%02d-%02d-%02d %02d:%02d:%02d" % (
+                    d.year,
+                    d.month,
+                    d.day,
+                    d.hour,
+                    d.minute,
+                    d.second
+                    )
+            if type(d) == decimal.Decimal:
+                return str(d)
+            if isinstance(d, (list, tuple)):
+                return gitdata.json.dumps(d)
+            if isinstance(d, bytes):
+                return base64.b64encode(d)
+            return d
+
+        def get_type_str(v):
+            t = repr(type(v))
+            if 'type' in t:
+                return t.strip('<type >').strip("'")
+            elif 'class' in t:
+                return t.strip('<class >').strip("'")
+            else:
+                return t
+
+        keys = [k for k in list(entity.keys()) if k not in ('_id', '__store')]
+        originals = [entity[k] for k in keys]
+        datatypes = [get_type_str(v) for v in originals]
+        values = [fixval(i) for i in originals]  # same fix as above
+        valid_types = [
+            'str', 'bytes', 'int', 'float', 'decimal.Decimal',
+            'datetime.date', 'datetime.datetime', 'bool', 'NoneType',
+            'list', 'tuple'
+            ]
+
+        for n, atype in enumerate(datatypes):
+            if atype not in valid_types:
+                msg = 'unsupported type <type %s> in value %r'
+                raise UnsupportedTypeException(msg % (atype, keys[n]))
+
+        return [k.lower() for k in keys], originals, datatypes, values
+
     def put(self, entity):
         """
         stores an entity
@@ -278,35 +357,6 @@ class EntityStore(Store):
         >>> db.close()
 
         """
-        def fixval(d):
-            if type(d) == datetime.datetime:
-                # avoids mysqldb reliance on strftime that lacks support
-                # for dates before 1900
-                return "%02d-%02d-%02d %02d:%02d:%02d" % (
-                    d.year,
-                    d.month,
-                    d.day,
-                    d.hour,
-                    d.minute,
-                    d.second
-                    )
-            if type(d) == decimal.Decimal:
-                return str(d)
-            if isinstance(d, (list, tuple)):
-                return gitdata.json.dumps(d)
-            if isinstance(d, bytes):
-                return base64.b64encode(d)
-            return d
-
-        def get_type_str(v):
-            t = repr(type(v))
-            if 'type' in t:
-                return t.strip('<type >').strip("'")
-            elif 'class' in t:
-                return t.strip('<class >').strip("'")
-            else:
-                return t
-
         db = self.db
 
         updating = '_id' in entity
@@ -315,45 +365,139 @@ class EntityStore(Store):
         else:
             self.before_insert(entity)
 
-        keys = [k for k in list(entity.keys()) if k not in ('_id', '__store')]
-        values = [entity[k] for k in keys]
-        datatypes = [get_type_str(v) for v in values]
-        values = [fixval(i) for i in values]  # same fix as above
-        valid_types = [
-            'str', 'bytes', 'int', 'float', 'decimal.Decimal',
-            'datetime.date', 'datetime.datetime', 'bool', 'NoneType',
-            'list', 'tuple'
-            ]
+        lkeys, originals, datatypes, values = self._encoded(entity)
+        cmd = (
+            'insert into attributes ('
+            '    kind, row_id, attribute, datatype, value'
+            ') values (%s,%s,%s,%s,%s)'
+            )
 
-        for n, atype in enumerate(datatypes):
-            if atype not in valid_types:
-                msg = 'unsupported type <type %s> in value %r'
-                raise UnsupportedTypeException(msg % (atype, keys[n]))
+        with db.transaction():
+            if updating:
+                id = entity['_id']
+
+                # only write the attributes that differ from those stored
+                stored = {}
+                obsolete = []
+                rs = db(
+                    'select id, attribute, datatype, value '
+                    'from attributes where row_id=%s', id
+                )
+                for attribute_id, attribute, datatype, value in rs:
+                    if attribute in stored:
+                        obsolete.append(attribute_id)
+                    else:
+                        stored[attribute] = attribute_id, datatype, value
+
+                inserts, updates = [], []
+                for key, datatype, value, original in zip(
+                        lkeys, datatypes, values, originals):
+                    if key not in stored:
+                        inserts.append((self.kind, id, key, datatype, value))
+                        continue
+                    attribute_id, stored_type, stored_value = stored.pop(key)
+                    if stored_type == datatype:
+                        decode = decoders[datatype]
+                        if decode is not None and stored_value is not None:
+                            stored_value = decode(stored_value)
+                        if repr(stored_value) == repr(original):
+                            continue
+                    updates.append((datatype, value, attribute_id))
+                obsolete.extend(row[0] for row in stored.values())
+
+                if obsolete:
+                    db(
+                        'delete from attributes where id in (%s)' % (
+                            ','.join(['%s'] * len(obsolete))
+                        ),
+                        *obsolete
+                    )
+                if updates:
+                    db.execute_many(
+                        'update attributes set datatype=%s, value=%s '
+                        'where id=%s', updates
+                    )
+            else:
+                db('insert into entities (kind) values (%s)', self.kind)
+                id = entity['_id'] = db.lastrowid
+                entity['__store'] = self
+                n = len(lkeys)
+                inserts = list(zip([self.kind]*n, [id]*n, lkeys, datatypes, values))
+
+            if inserts:
+                db.execute_many(cmd, inserts)
 
         if updating:
-            id = entity['_id']
-            db('delete from attributes where row_id=%s', id)
+            self.after_update(entity)
         else:
-            db('insert into entities (kind) values (%s)', self.kind)
-            id = entity['_id'] = db.lastrowid
-            entity['__store'] = self
+            self.after_insert(entity)
+
+        return id
+
+    def put_many(self, entities):
+        """
+        stores many entities, returning their ids
+
+        New entities are given a block of ids reserved from the entities
+        sequence and all of their attributes are inserted in one batch,
+        in one transaction, with the insert hooks run before and after
+        the batch.  Entities that already have an id are updated with put.
+
+        >>> db = gitdata.database.setup_test_database()
+
+        >>> people = EntityStore(db, 'person')
+        >>> people.put_many([dict(name='Sally', age=25), dict(name='Joe')])
+        [1, 2]
+        >>> sally = people.get(1)
+        >>> sally['age'] = 26
+        >>> people.put_many([dict(name='Sam', age=15), sally])
+        [3, 1]
+        >>> print(people)
+        dict
+        _id name  age
+        --- ----- ----
+          1 Sally 26
+          2 Joe   None
+          3 Sam   15
+        3 dict records
+
+        >>> db.close()
+
+        """
+        db = self.db
+        entities = list(entities)
+        new = [entity for entity in entities if '_id' not in entity]
+        existing = [entity for entity in entities if '_id' in entity]
+
+        for entity in new:
+            self.before_insert(entity)
+        encoded = [self._encoded(entity) for entity in new]
 
-        n = len(keys)
-        lkeys = [k.lower() for k in keys]
-        param_list = list(zip([self.kind]*n, [id]*n, lkeys, datatypes, values))
         cmd = (
             'insert into attributes ('
             '    kind, row_id, attribute, datatype, value'
             ') values (%s,%s,%s,%s,%s)'
             )
-        db.execute_many(cmd, param_list)
 
-        if updating:
-            self.after_update(entity)
-        else:
+        with db.transaction():
+            ids = db.insert_many('entities', ['kind'], [(self.kind,)] * len(new))
+            db.execute_many(cmd, [
+                (self.kind, row_id, key, datatype, value)
+                for row_id, (lkeys, _, datatypes, values) in zip(ids, encoded)
+                for key, datatype, value in zip(lkeys, datatypes, values)
+            ])
+
+        for row_id, entity in zip(ids, new):
+            entity['_id'] = row_id
+            entity['__store'] = self
+
+        for entity in new:
             self.after_insert(entity)
 
-        return id
+        for entity in existing:
+            self.put(entity)
+
+        return [entity['_id'] for entity in entities]
 
     def get(self, keys):
         """
@@ -409,12 +553,17 @@ class EntityStore(Store):
             else:
                 return None
 
-        cmd = 'select * from attributes where kind=%s and row_id in (%s)' % (
-            '%s', ','.join(['%s']*len(keys))
-            )
-        rs = self.db(cmd, self.kind, *keys)
+        rs = []
+        for chunk in chunked(keys, self.chunk_size):
+            cmd = 'select * from attributes where kind=%s and row_id in (%s)' % (
+                '%s', ','.join(['%s']*len(chunk))
+                )
+            rs.extend(self.db(cmd, self.kind, *chunk))
 
-        result = entify(rs, self)
+        entities = {entity['_id']: entity for entity in entify(rs, self)}
+        result = RecordList(
+            entities[key] for key in dict.fromkeys(keys) if key in entities
+        )
 
         if as_list:
             return result
@@ -456,11 +605,12 @@ class EntityStore(Store):
             for rec in affected:
                 self.before_delete(rec)
 
-            spots = ','.join('%s' for _ in ids)
-            cmd = 'delete from attributes where row_id in ({})'.format(spots)
-            self.db(cmd, *ids)
-            cmd = 'delete from entities where id in ({})'.format(spots)
-            self.db(cmd, *ids)
+            for chunk in chunked(ids, self.chunk_size):
+                spots = ','.join('%s' for _ in chunk)
+                cmd = 'delete from attributes where row_id in ({})'.format(spots)
+                self.db(cmd, *chunk)
+                cmd = 'delete from entities where id in ({})'.format(spots)
+                self.db(cmd, *chunk)
 
             for rec in affected:
                 self.after_delete(rec)
@@ -541,15 +691,16 @@ class EntityStore(Store):
         """
         if not isinstance(keys, (list, tuple)):
             keys = (keys,)
-        slots = (','.join(['%s']*len(keys)))
-        cmd = (
-            'select distinct row_id '
-            'from attributes '
-            'where row_id in (%s)'
-            ) % slots
-        rs = self.db(cmd, *keys)
+        found_keys = set()
+        for chunk in chunked(keys, self.chunk_size):
+            slots = (','.join(['%s']*len(chunk)))
+            cmd = (
+                'select distinct row_id '
+                'from attributes '
+                'where row_id in (%s)'
+                ) % slots
+            found_keys.update(rec[0] for rec in self.db(cmd, *chunk))
 
-        found_keys = [rec[0] for rec in rs]
         if len(keys) > 1:
             result = [(key in found_keys) for key in keys]
         else:
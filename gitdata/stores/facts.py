@@ -2,13 +2,21 @@
     gitdata fact store
 """
 
+from collections import Counter
 import io
+import json
 import os
 import sqlite3
 
 import gitdata
 import gitdata.buckets
-from .common import fixval, get_type_str, AbstractStore, entify, retype
+from datetime import date, datetime
+from decimal import Decimal
+
+from .common import (
+    fixval, get_type_str, AbstractStore, entify, retype, is_variable,
+    comparisons, comparable, compare, fact_key
+)
 
 valid_types = [
     'str', 'bytes', 'int', 'float', 'decimal.Decimal',
@@ -22,10 +30,127 @@ insert = (
 )
 
 delete = (
-    'delete from facts where '
-    '    entity=? and attribute=? and value=?'
+    'delete from facts where rowid in ('
+    '    select rowid from facts'
+    '    where entity=? and attribute=? and value=? limit 1'
+    ')'
 )
 
+columns = ('entity', 'attribute', 'value')
+
+# record lists keep their rows in record_rows instead of includes facts
+# and the values of the rows in record_values, which reads like facts
+record_tables = """
+create table if not exists record_lists (
+    id integer primary key,
+    uid char(32) not null,
+    attributes text not null
+);
+create table if not exists record_rows (
+    list integer not null,
+    uid char(32) not null,
+    included integer not null default 1
+);
+create index if not exists record_rows_list on record_rows (list);
+create index if not exists record_rows_uid on record_rows (uid);
+create table if not exists record_values (
+    uid char(32) not null,
+    attribute varchar(100) not null,
+    value_type varchar(30) not null,
+    value mediumtext not null
+);
+create index if not exists record_values_uid on record_values (uid)
+"""
+
+# stay well under the sqlite limit on parameters per statement
+max_parameters = 500
+
+numeric_types = ('int', 'float', 'decimal.Decimal', 'bool')
+
+numeric_types_sql = ', '.join("'%s'" % t for t in numeric_types)
+
+
+def numeric_value(value, value_type):
+    """convert a numeric result computed by the database to its type"""
+    if value is None:
+        return None
+    if value_type == 'int':
+        return int(value)
+    if value_type == 'float':
+        return float(value)
+    if value_type == 'decimal.Decimal':
+        return Decimal(str(value))
+    if value_type == 'bool':
+        return bool(value)
+    return value
+
+
+def condition(value, value_type, op, operand):
+    """return SQL and parameters that filter a value column
+
+    Values are only compared with operands of a compatible type so
+    the database filters the same way compare does in Python.
+    """
+    if op == 'between':
+        low, high = operand
+        lower, lower_params = condition(value, value_type, '>=', low)
+        upper, upper_params = condition(value, value_type, '<=', high)
+        return '(%s and %s)' % (lower, upper), lower_params + upper_params
+
+    if op == 'in':
+        parts = [condition(value, value_type, '=', item) for item in operand]
+        if not parts:
+            return '0', []
+        return (
+            '(%s)' % ' or '.join(sql for sql, _ in parts),
+            [param for _, params in parts for param in params]
+        )
+
+    if op == '!=':
+        sql, params = condition(value, value_type, '=', operand)
+        return 'not ' + sql, params
+
+    if op not in comparisons:
+        raise Exception('unsupported operator: ' + repr(op))
+
+    if operand is None:
+        return '0', []
+
+    if isinstance(operand, (bool, int, float, Decimal)):
+        if isinstance(operand, Decimal):
+            operand = float(operand)
+        return (
+            '(%s in (%s) and cast(%s as numeric) %s ?)' % (
+                value_type, numeric_types_sql, value, op
+            ),
+            [operand]
+        )
+
+    if isinstance(operand, date):
+        operand, _ = comparable(operand, datetime.min)
+        return (
+            "(%s in ('datetime.date', 'datetime.datetime') and "
+            "(case when %s='datetime.date' then %s || ' 00:00:00' else %s end) %s ?)" % (
+                value_type, value_type, value, value, op
+            ),
+            [fixval(operand)]
+        )
+
+    return (
+        '(%s=? and %s %s ?)' % (value_type, value, op),
+        [get_type_str(operand), fixval(operand)]
+    )
+
+
+def literal(text):
+    """return text quoted as an SQL string literal
+
+    >>> literal("Joe's")
+    "'Joe''s'"
+
+    """
+    return "'%s'" % text.replace("'", "''")
+
 
 def get_db(connection):
     def query(cmd, *args, **kwargs):
@@ -36,7 +161,20 @@ def get_db(connection):
 
 
 class Sqlite3FactStore(AbstractStore):
-    """Sqlite3 based Entity Store"""
+    """Sqlite3 based Entity Store
+
+    Lists of records that all have the same keys can be stored with
+    add_records in the record tables, which keep each list and its rows
+    once rather than as includes facts.  Facts are read through the
+    all_facts view, which combines the facts table with the facts the
+    record tables represent, so readers see the same facts either way.
+    """
+
+    # the fewest records add_records is used for
+    min_records = 100
+
+    # changes made through this store
+    writes = 0
 
     def __init__(self, database, *args, new_uid=gitdata.utils.new_uid, **kwargs):
         self.database = database
@@ -47,6 +185,13 @@ class Sqlite3FactStore(AbstractStore):
         else:
             path = os.path.join(os.path.dirname(database or '.'), 'blobs')
             self.bucket = gitdata.buckets.FileBucket(path, id_factory=new_uid)
+        self._refresh_view()
+
+    @property
+    def version(self):
+        """changes whenever the facts change, through any connection"""
+        cursor = self.connection.execute('pragma data_version')
+        return self.writes, cursor.fetchone()[0]
 
     def setup(self):
         """Set up the persistent data store"""
@@ -62,47 +207,213 @@ class Sqlite3FactStore(AbstractStore):
 
         with self.connection:
             cursor = self.connection.cursor()
+            self._drop_tables(cursor)
             commands = list(filter(bool, sql.split(';\n')))
             for command in commands:
                 cursor.execute(command)
+        self._refresh_view()
+        self.writes += 1
+
+    def _stored(self, value):
+        """return the type and value to store for a fact value"""
+        if isinstance(value, io.BytesIO):
+            value = self.bucket.puts(value)
+        value_type = get_type_str(value)
+        if value_type not in valid_types:
+            msg = 'unsupported type <type %s> in value %r'
+            raise Exception(msg % (value_type, value))
+        if isinstance(value, Decimal):
+            value = str(value)
+        return value_type, value
 
     def add(self, facts):
         """add facts"""
         records = []
         for entity, attribute, value in facts:
             if value is not None:
-                if isinstance(value, io.BytesIO):
-                    value = self.bucket.puts(value)
-                value_type = get_type_str(value)
-                if value_type in valid_types:
-                    records.append((entity, attribute, value_type, value))
-                else:
-                    msg = 'unsupported type <type %s> in value %r'
-                    raise Exception(msg % (value_type, value))
+                records.append((entity, attribute) + self._stored(value))
 
         with self.connection:
             cursor = self.connection.cursor()
             cursor.executemany(insert, records)
+        self.writes += 1
+
+    def _lists(self):
+        """return the record lists as (uid, attributes) tuples"""
+        db = get_db(self.connection)
+        return [
+            (uid, json.loads(attributes))
+            for uid, attributes in db(
+                'select uid, attributes from record_lists order by id'
+            )
+        ]
+
+    def _has_lists(self):
+        db = get_db(self.connection)
+        return bool(db('select id from record_lists limit 1'))
+
+    def _drop_tables(self, cursor):
+        for name in ('record_values', 'record_rows', 'record_lists'):
+            cursor.execute('drop table if exists %s' % name)
+
+    def _create_tables(self, cursor):
+        for command in filter(bool, map(str.strip, record_tables.split(';\n'))):
+            cursor.execute(command)
+
+    def _refresh_view(self):
+        """define the all_facts view over the facts and record tables
+
+        The record tables are created first if they are missing, so the
+        view sees the record lists added later through any connection.
+        """
+        with self.connection:
+            cursor = self.connection.cursor()
+            self._create_tables(cursor)
+            cursor.execute('drop view if exists temp.all_facts')
+            cursor.execute(
+                'create temp view all_facts as '
+                'select entity, attribute, value_type, value from facts '
+                'union all '
+                'select uid, attribute, value_type, value from record_values '
+                'union all '
+                "select l.uid, 'includes', 'str', r.uid "
+                'from record_lists l join record_rows r on r.list=l.id '
+                'where r.included'
+            )
+
+    def add_records(self, uid, attributes, rows):
+        """add a list of records to the record tables
+
+        The list has the given uid and each row is a (uid, values) pair
+        with one value for each attribute.  The facts read back are the
+        ones adding the digested list would have added.
+        """
+        attributes = list(attributes)
+        with self.connection:
+            cursor = self.connection.cursor()
+            cursor.execute(
+                'insert into record_lists (uid, attributes) values (?, ?)',
+                (uid, json.dumps(attributes))
+            )
+            list_id = cursor.lastrowid
+            values = []
+            row_uids = []
+            for row_uid, row in rows:
+                row_uids.append((list_id, row_uid))
+                values.extend(
+                    (row_uid, attribute) + self._stored(value)
+                    for attribute, value in zip(attributes, row)
+                    if value is not None
+                )
+            cursor.executemany(
+                'insert into record_rows (list, uid) values (?, ?)', row_uids
+            )
+            cursor.executemany(
+                'insert into record_values ('
+                '    uid, attribute, value_type, value'
+                ') values (?, ?, ?, ?)', values
+            )
+        self.writes += 1
 
     def remove(self, facts):
-        """remove facts"""
-        records = facts
+        """remove facts
+
+        One stored copy is removed for each fact, as a fact added twice
+        is stored twice.
+        """
+        records = self._has_lists()
         with self.connection:
             cursor = self.connection.cursor()
-            cursor.executemany(delete, records)
+            for s, p, o in facts:
+                cursor.execute(delete, (s, p, o))
+                if cursor.rowcount or not records:
+                    continue
+                if p == 'includes':
+                    cursor.execute(
+                        'update record_rows set included=0 where rowid in ('
+                        '    select r.rowid from record_rows r'
+                        '    join record_lists l on l.id=r.list'
+                        '    where l.uid=? and r.uid=? and r.included limit 1'
+                        ')', (s, o)
+                    )
+                    if cursor.rowcount:
+                        continue
+                cursor.execute(
+                    'delete from record_values where rowid in ('
+                    '    select rowid from record_values'
+                    '    where uid=? and attribute=? and value=? limit 1'
+                    ')', (s, p, o)
+                )
+        self.writes += 1
+
+    def missing(self, facts):
+        """return the facts that are not already stored
+
+        The facts are compared as they are stored rather than as they
+        are read back, so values stored as text, like floats and
+        datetimes, are found even where reading them back changes them.
+        """
+        facts = list(facts)
+        candidates = []
+        for n, (entity, attribute, value) in enumerate(facts):
+            if value is not None and not isinstance(value, io.BytesIO):
+                candidates.append((n, entity, attribute) + self._stored(value))
 
-    def matching(self, pattern=(None, None, None)):
-        """Return facts matching pattern"""
+        with self.connection:
+            cursor = self.connection.cursor()
+            cursor.execute(
+                'create temp table if not exists candidates ('
+                '    n integer not null,'
+                '    entity char(32) not null,'
+                '    attribute varchar(100) not null,'
+                '    value_type varchar(30) not null,'
+                '    value mediumtext not null'
+                ')'
+            )
+            cursor.execute('delete from candidates')
+            cursor.executemany(
+                'insert into candidates ('
+                '    n, entity, attribute, value_type, value'
+                ') values (?, ?, ?, ?, ?)', candidates
+            )
+            existing = Counter(cursor.execute(
+                'select entity, attribute, value_type, cast(value as text) '
+                'from all_facts '
+                'where entity in (select entity from candidates)'
+            ))
+            found = set()
+            for n, *key in cursor.execute(
+                'select n, entity, attribute, value_type, cast(value as text) '
+                'from candidates order by n'
+            ):
+                key = tuple(key)
+                if existing[key] > 0:
+                    existing[key] -= 1
+                    found.add(n)
+            cursor.execute('delete from candidates')
+
+        return [fact for n, fact in enumerate(facts) if n not in found]
+
+    def matching(self, pattern=(None, None, None), where=None):
+        """Return facts matching pattern
+
+        The optional where conditions are (operator, operand) filters
+        applied to the fact values by the database.
+        """
+
+        if where:
+            yield from self._filtered(pattern, where)
+            return
 
         sub, pred, obj = pattern
 
-        spn = 'select value, value_type from facts where entity=? and attribute=?'
-        sno = 'select attribute from facts where entity=? and value=?'
-        snn = 'select attribute, value, value_type from facts where entity=?'
-        npo = 'select entity from facts where attribute=? and value=?'
-        npn = 'select entity, value, value_type from facts where attribute=?'
-        nno = 'select entity, attribute from facts where value=?'
-        nnn = 'select entity, attribute, value, value_type from facts'
+        spn = 'select value, value_type from all_facts where entity=? and attribute=?'
+        sno = 'select attribute from all_facts where entity=? and value=?'
+        snn = 'select attribute, value, value_type from all_facts where entity=?'
+        npo = 'select entity from all_facts where attribute=? and value=?'
+        npn = 'select entity, value, value_type from all_facts where attribute=?'
+        nno = 'select entity, attribute from all_facts where value=?'
+        nnn = 'select entity, attribute, value, value_type from all_facts'
 
         with self.connection:
             cursor = self.connection.cursor()
@@ -156,6 +467,239 @@ class Sqlite3FactStore(AbstractStore):
                         for r, s, value, value_type in q:
                             yield (r, s, retype(value, value_type))
 
+    def _filtered(self, pattern, where):
+        """Return facts matching pattern with values filtered"""
+        conditions = []
+        params = []
+        for column, term in zip(columns, pattern):
+            if term is not None:
+                conditions.append(column + '=?')
+                params.append(term)
+        for op, operand in where:
+            sql, values = condition('value', 'value_type', op, operand)
+            conditions.append(sql)
+            params.extend(values)
+
+        cmd = 'select entity, attribute, value, value_type from all_facts'
+        if conditions:
+            cmd += ' where ' + ' and '.join(conditions)
+
+        with self.connection:
+            db = get_db(self.connection)
+            for s, p, value, value_type in db(cmd, params):
+                yield (s, p, retype(value, value_type))
+
+    def matching_any(self, pattern=(None, None, None)):
+        """Return facts matching any of the values given for each term
+
+        Each term of the pattern is either None or a collection of
+        values.  Long collections are looked up in chunks.
+        """
+        terms = [None if term is None else list(term) for term in pattern]
+        given = [term for term in terms if term is not None]
+        if any(not term for term in given):
+            return
+        if not given:
+            yield from self.matching()
+            return
+
+        longest = max(given, key=len)
+        position = terms.index(longest)
+        size = max(1, max_parameters - sum(len(t) for t in given if t is not longest))
+
+        db = get_db(self.connection)
+        for start in range(0, len(longest), size):
+            chunk = terms[:]
+            chunk[position] = longest[start:start+size]
+            conditions = []
+            params = []
+            for column, values in zip(columns, chunk):
+                if values is not None:
+                    conditions.append(
+                        '%s in (%s)' % (column, ','.join('?' * len(values)))
+                    )
+                    params.extend(values)
+            cmd = (
+                'select entity, attribute, value, value_type from all_facts '
+                'where ' + ' and '.join(conditions)
+            )
+            for s, p, value, value_type in db(cmd, params):
+                yield (s, p, retype(value, value_type))
+
+    def ordered(self):
+        """Generate all facts in fact_key order
+
+        The database orders the facts by entity and attribute so only
+        the values of one attribute of one entity are held at a time.
+        """
+        cursor = self.connection.cursor()
+        cursor.execute(
+            'select entity, attribute, value, value_type from all_facts '
+            'order by entity, attribute'
+        )
+        group = []
+        for entity, attribute, value, value_type in cursor:
+            if group and group[0][:2] != (entity, attribute):
+                yield from sorted(group, key=fact_key)
+                group = []
+            group.append((entity, attribute, retype(value, value_type)))
+        yield from sorted(group, key=fact_key)
+
+    def aggregate(self, clauses, group_by=None, aggregates=None, where=None):
+        """Return aggregated query results computed by the database
+
+        The clauses are translated into a self join of the facts table
+        with the filtering, grouping and aggregation done in SQL.
+        """
+        group_by = list(group_by or [])
+        aggregates = dict(aggregates or {})
+
+        variables = {}
+        tables = []
+        conditions = []
+        params = []
+        for n, clause in enumerate(clauses):
+            alias = 'f%d' % n
+            tables.append('all_facts ' + alias)
+            for column, term in zip(columns, clause):
+                if is_variable(term):
+                    if term in variables:
+                        conditions.append('%s.%s=%s.%s' % ((alias, column) + variables[term]))
+                    else:
+                        variables[term] = (alias, column)
+                elif term is not None:
+                    conditions.append('%s.%s=?' % (alias, column))
+                    params.append(term)
+
+        def located(variable):
+            if variable not in variables:
+                raise Exception('unknown query variable: ' + repr(variable))
+            return variables[variable]
+
+        def typed(alias, column):
+            if column == 'value':
+                return alias + '.value_type'
+            return "'str'"
+
+        for variable, op, operand in where or []:
+            alias, column = located(variable)
+            sql, values = condition(
+                '%s.%s' % (alias, column), typed(alias, column), op, operand
+            )
+            conditions.append(sql)
+            params.extend(values)
+
+        selected = []
+        grouping = []
+        for variable in group_by:
+            alias, column = located(variable)
+            selected.extend(['%s.%s' % (alias, column), typed(alias, column)])
+            grouping.extend(selected[-2:])
+
+        # count and sum are computed together with the groups.  Each min
+        # and max is computed by a query of its own, so the bare type and
+        # value columns come from the row with the least or greatest value.
+        # Decimal values would be summed in floating point by the database
+        # so they are read separately and added exactly
+        totals = []
+        extremes = {}
+        decimals = {}
+        for name, (function, variable) in aggregates.items():
+            if function == 'count':
+                totals.extend(['count(*)', "'int'"])
+                continue
+            if function not in ('sum', 'min', 'max'):
+                raise Exception('unsupported aggregate: ' + repr(function))
+            alias, column = located(variable)
+            if function == 'sum':
+                if column == 'value':
+                    totals.extend([
+                        'sum(case when {0}.value_type in ({1}) '
+                        'then cast({0}.value as numeric) end)'.format(
+                            alias, "'int', 'float', 'bool'"
+                        ),
+                        "case max(case {0}.value_type "
+                        "when 'float' then 2 when 'decimal.Decimal' then 1 "
+                        "end) when 2 then 'float' "
+                        "when 1 then 'decimal.Decimal' "
+                        "else 'int' end".format(alias),
+                    ])
+                    decimals[name] = alias
+                else:
+                    totals.extend(['null', "'int'"])
+            elif column == 'value':
+                extremes[name] = [
+                    '{1}(case when {0}.value_type in ({2}) '
+                    'then cast({0}.value as numeric) else {0}.value end)'.format(
+                        alias, function, numeric_types_sql
+                    ),
+                    alias + '.value_type',
+                    alias + '.value',
+                ]
+            else:
+                extremes[name] = [
+                    '%s(%s.%s)' % (function, alias, column),
+                    "'str'",
+                    '%s.%s' % (alias, column),
+                ]
+
+        if not tables:
+            return [] if group_by else dict((k, None) for k in aggregates)
+
+        db = get_db(self.connection)
+
+        def run(expressions, extra=None, grouped=True):
+            cmd = 'select {} from {}'.format(', '.join(expressions), ', '.join(tables))
+            where = conditions + ([extra] if extra else [])
+            if where:
+                cmd += ' where ' + ' and '.join(where)
+            if grouping and grouped:
+                cmd += ' group by ' + ', '.join(grouping)
+            return db(cmd, params)
+
+        def converted(value, value_type):
+            if value is None:
+                return None
+            if value_type in numeric_types:
+                return numeric_value(value, value_type)
+            return retype(value, value_type)
+
+        width = len(selected)
+        rows = run(selected + (totals or ['count(*)']))
+        found = {}
+        for name, expressions in extremes.items():
+            for row in run(selected + expressions):
+                value_type, value = row[-2:]
+                found[row[:width], name] = converted(value, value_type)
+        exact = {}
+        for name, alias in decimals.items():
+            extra = "%s.value_type='decimal.Decimal'" % alias
+            for row in run(selected + [alias + '.value'], extra, grouped=False):
+                exact.setdefault((row[:width], name), []).append(Decimal(row[-1]))
+
+        names = [variable[1:] for variable in group_by] + list(aggregates)
+        result = []
+        for row in rows:
+            values = [converted(*row[n:n+2]) for n in range(0, width, 2)]
+            computed = iter(range(width, len(row), 2))
+            for name in aggregates:
+                if name in extremes:
+                    values.append(found.get((row[:width], name)))
+                else:
+                    n = next(computed)
+                    value = converted(*row[n:n+2])
+                    extra = exact.get((row[:width], name))
+                    if extra and isinstance(value, float):
+                        value = sum(map(float, extra), value)
+                    elif extra:
+                        value = sum(extra, Decimal(value or 0))
+                    values.append(value)
+            result.append(dict(zip(names, values)))
+
+        if not group_by:
+            return result[0]
+        return result
+
     def put(self, entity):
         """stores an entity"""
 
@@ -181,6 +725,7 @@ class Sqlite3FactStore(AbstractStore):
         with self.connection:
             cursor = self.connection.cursor()
             cursor.executemany(insert, param_list)
+        self.writes += 1
 
         return uid
 
@@ -189,7 +734,7 @@ class Sqlite3FactStore(AbstractStore):
         def unbucketize(fact):
             s, p, t, o = fact
             return s, p, t, self.bucket.gets(o, o)
-        select = 'select * from facts where entity=?'
+        select = 'select * from all_facts where entity=?'
         cursor = self.connection.cursor()
         cursor.execute(select, (uid,))
         facts = list(map(unbucketize, cursor.fetchall()))
@@ -202,6 +747,16 @@ class Sqlite3FactStore(AbstractStore):
         with self.connection:
             cursor = self.connection.cursor()
             cursor.execute(select, (uid,))
+            if self._has_lists():
+                cursor.execute(
+                    'update record_rows set included=0 where list in ('
+                    '    select id from record_lists where uid=?'
+                    ')', (uid,)
+                )
+                cursor.execute(
+                    'delete from record_values where uid=?', (uid,)
+                )
+        self.writes += 1
 
     def clear(self):
         """delete all facts"""
@@ -209,11 +764,14 @@ class Sqlite3FactStore(AbstractStore):
         with self.connection as connection:
             cursor = connection.cursor()
             cursor.execute('delete from facts')
+            for name in ('record_values', 'record_rows', 'record_lists'):
+                cursor.execute('delete from %s' % name)
+        self.writes += 1
 
     def __len__(self):
         """return the number of facts stored"""
         cursor = self.connection.cursor()
-        cursor.execute('select count(*) from facts')
+        cursor.execute('select count(*) from all_facts')
         result = list(cursor.fetchall())[0][0]
         return result
 
@@ -229,16 +787,19 @@ class MemoryFactStore(AbstractStore):
     def setup(self):
         """Setup persistent store"""
         self.facts = []
+        self.version += 1
 
     def add(self, facts):
         self.facts.extend(
             filter(lambda a: a[-1] is not None, facts)
         )
+        self.version += 1
 
     def remove(self, facts):
         for fact in facts:
             if fact in self.facts:
                 self.facts.remove(fact)
+        self.version += 1
 
     def put(self, entity):
         """store an entity"""
@@ -258,13 +819,19 @@ class MemoryFactStore(AbstractStore):
     def delete(self, uid):
         """delete all facts for an entity"""
         self.facts[:] = (fact for fact in self.facts if fact[0] != uid)
+        self.version += 1
 
     def clear(self):
         """clear the fact store"""
         self.facts = []
+        self.version += 1
 
-    def matching(self, pattern=(None, None, None)):
-        """Return facts matching pattern"""
+    def matching(self, pattern=(None, None, None), where=None):
+        """Return facts matching pattern
+
+        The optional where conditions are (operator, operand) filters
+        applied to the fact values.
+        """
 
         sub, pred, obj = pattern
 
@@ -277,8 +844,25 @@ class MemoryFactStore(AbstractStore):
                 (obj is None or obj == value)
             )
         ]
+        if where:
+            data = [
+                fact for fact in data
+                if all(compare(fact[2], op, operand) for op, operand in where)
+            ]
         return data
 
+    def matching_any(self, pattern=(None, None, None)):
+        """Return facts matching any of the values given for each term"""
+        terms = [None if term is None else set(term) for term in pattern]
+        return [
+            fact for fact in self.facts
+            if all(term is None or value in term for term, value in zip(terms, fact))
+        ]
+
+    def ordered(self):
+        """Return all facts in fact_key order"""
+        return sorted(self.facts, key=fact_key)
+
     def __len__(self):
         """return the number of facts stored"""
         return len(self.facts)
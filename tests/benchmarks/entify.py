@@ -0,0 +1,129 @@
+"""
+    entify benchmark
+
+    Times EntityStore.all() and get() with the table driven entify and
+    with the previous if/elif implementation, which is kept here for
+    comparison.
+
+    usage: python tests/benchmarks/entify.py [entities]
+"""
+
+import base64
+import datetime
+import decimal
+import sys
+import timeit
+
+import gitdata
+import gitdata.database
+import gitdata.json
+import gitdata.stores.entities
+from gitdata.stores.entities import (
+    EntityStore, RecordList, UnsupportedTypeException
+)
+
+
+def legacy_entify(rs, storage):
+    """the if/elif entify this benchmark compares against"""
+    klass = storage.klass
+    entities = {}
+
+    if hasattr(rs, 'data'):
+        rs = rs.data
+
+    for _, _, row_id, attribute, datatype, value in rs:
+
+        if datatype == 'str':
+            pass
+        elif datatype == 'unicode' and isinstance(value, str):
+            pass
+        elif datatype == 'unicode':
+            value = value.decode('utf8')
+        elif datatype == "int":
+            value = int(value)
+        elif datatype == 'float':
+            value = float(value)
+        elif datatype == 'decimal.Decimal':
+            value = decimal.Decimal(value)
+        elif datatype == "datetime.date":
+            y = int(value[:4])
+            m = int(value[5:7])
+            d = int(value[8:10])
+            value = datetime.date(y, m, d)
+        elif datatype == "datetime.datetime":
+            y = int(value[:4])
+            m = int(value[5:7])
+            d = int(value[8:10])
+            hr = int(value[11:13])
+            mn = int(value[14:16])
+            sc = int(value[17:19])
+            value = datetime.datetime(y, m, d, hr, mn, sc)
+        elif datatype == 'bool':
+            value = (value == '1' or value == 'True')
+        elif datatype == 'NoneType':
+            value = None
+        elif datatype == 'bytes':
+            value = base64.b64decode(value)
+        elif datatype == 'list':
+            value = gitdata.json.loads(value)
+        elif datatype == 'tuple':
+            value = tuple(gitdata.json.loads(value))
+        else:
+            msg = 'unsupported data type: ' + repr(datatype)
+            raise UnsupportedTypeException(msg)
+
+        entities.setdefault(row_id, klass(_id=row_id, __store=storage))[attribute] = value
+
+    return RecordList(entities.values())
+
+
+def load(db, count):
+    """add count entities with a mix of attribute types"""
+    rows = []
+    for n in range(1, count + 1):
+        rows.extend([
+            ('person', n, 'name', 'str', 'Person %d' % n),
+            ('person', n, 'age', 'int', str(n % 90)),
+            ('person', n, 'salary', 'decimal.Decimal', '%d.50' % n),
+            ('person', n, 'birthdate', 'datetime.date', '1990-01-%02d' % (n % 28 + 1)),
+            ('person', n, 'updated', 'datetime.datetime', '2020-05-02 10:11:12'),
+            ('person', n, 'active', 'bool', '1'),
+        ])
+    db.execute_many(
+        'insert into attributes (kind, row_id, attribute, datatype, value) '
+        'values (%s, %s, %s, %s, %s)',
+        rows
+    )
+
+
+def best(function, repeat=5):
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def main(count=100000):
+    db = gitdata.database.setup_test_database()
+    load(db, count)
+    people = EntityStore(db, kind='person')
+    keys = list(range(1, count + 1, max(1, count // 1000)))
+    rs = list(db('select * from attributes where kind="person"'))
+
+    table = gitdata.stores.entities.entify
+    results = []
+    for name, implementation in [('if/elif', legacy_entify), ('table', table)]:
+        gitdata.stores.entities.entify = implementation
+        results.append((
+            name,
+            best(lambda: implementation(rs, people)),
+            best(people.all),
+            best(lambda: people.get(keys)),
+        ))
+    gitdata.stores.entities.entify = table
+
+    print('%d entities, %d attribute rows' % (count, len(rs)))
+    print('%-8s %10s %10s %10s' % ('entify', 'decode', 'all()', 'get()'))
+    for name, decode, everything, some in results:
+        print('%-8s %9.3fs %9.3fs %9.3fs' % (name, decode, everything, some))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,74 @@
+"""
+    gitdata adjacency tests
+"""
+# pylint: disable=missing-docstring
+
+import json
+import unittest
+
+from gitdata.adjacency import Adjacency
+from gitdata.graphs import Graph
+from gitdata.utils import test_uid_maker
+
+
+class TestAdjacency(unittest.TestCase):
+
+    def setUp(self):
+        self.adjacency = Adjacency(
+            ['a', 'b', 'c', 'd', 'e'],
+            [('a', 'b'), ('b', 'c'), ('c', 'a'), ('d', 'e')]
+        )
+
+    def test_csr(self):
+        a = self.adjacency
+        self.assertEqual(list(a.offsets), [0, 1, 2, 3, 4, 4])
+        self.assertEqual(list(a.targets), [1, 2, 0, 4])
+        self.assertEqual(a.edge_count, 4)
+        self.assertEqual(len(a), 5)
+
+    def test_degrees(self):
+        a = self.adjacency
+        self.assertEqual(list(a.out_degrees()), [1, 1, 1, 1, 0])
+        self.assertEqual(list(a.in_degrees()), [1, 1, 1, 0, 1])
+        self.assertEqual(a.degree_distribution(reverse=True), {0: 1, 1: 4})
+
+    def test_transpose(self):
+        self.assertEqual(self.adjacency.transpose().successors('a'), ['c'])
+
+    def test_components(self):
+        self.assertEqual(
+            self.adjacency.components(),
+            [['a', 'b', 'c'], ['d', 'e']]
+        )
+
+    def test_pagerank(self):
+        rank = self.adjacency.pagerank()
+        self.assertAlmostEqual(sum(rank.values()), 1.0)
+        self.assertAlmostEqual(rank['a'], rank['b'])
+        self.assertGreater(rank['e'], rank['d'])
+
+
+class TestGraphAdjacency(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = Graph(new_uid=test_uid_maker())
+        self.graph.clear()
+
+    def test_node_edges(self):
+        g = self.graph
+        g.add(dict(name='Joe', friends=[dict(name='Sam'), dict(name='Pat')]))
+        a = g.to_adjacency()
+        self.assertEqual(a.nodes, ['1', '3', '2', '4'])
+        self.assertEqual(a.successors('1'), ['2'])
+        self.assertEqual(a.successors('2'), ['3', '4'])
+        self.assertEqual(g.to_adjacency(predicates=['includes']).edge_count, 2)
+
+    def test_link_edges(self):
+        with open('examples/miserables.json') as f:
+            self.graph.add(json.load(f))
+        a = self.graph.to_adjacency(edges=('source', 'target'))
+        self.assertEqual(a.edge_count, 254)
+        self.assertEqual(len(a), 77)
+        self.assertEqual(len(a.components()), 1)
+        rank = a.pagerank()
+        self.assertEqual(max(rank, key=rank.get), 'Valjean')
@@ -649,6 +649,65 @@ class TestSqlite3Database(unittest.TestCase, DatabaseTests):
   message: near "whoops": syntax error
 """)
 
+    def test_setup_indexes(self):
+        db = self.db
+        db.setup()
+        self.assertEqual(
+            sorted(db.get_index_names('attributes')),
+            [
+                'attributes_kind_row_id_key',
+                'attributes_kv',
+                'attributes_row_id_key',
+            ]
+        )
+        self.assertEqual(db.get_index_names('entities'), ['entities_kind_key'])
+
+    def create_old_schema(self):
+        db = self.db
+        db("""
+            create table attributes (
+                id integer not null primary key autoincrement,
+                kind varchar(100) not null,
+                row_id integer not null,
+                attribute varchar(100),
+                datatype varchar(30),
+                value mediumtext
+            )
+        """)
+        db('create table entities (id integer primary key, kind varchar(100))')
+        db(
+            'insert into attributes (kind, row_id, attribute, datatype, value) '
+            "values ('person', 1, 'name', 'str', 'Joe')"
+        )
+        self.assertEqual(db.get_index_names('attributes'), [])
+
+    def test_migrate(self):
+        db = self.db
+        self.create_old_schema()
+        db.migrate()
+        db.migrate()
+        self.assertEqual(len(db.get_index_names('attributes')), 3)
+        self.assertEqual(
+            list(db("select value from attributes where kind='person'")),
+            [('Joe',)]
+        )
+        plan = ' '.join(str(row[-1]) for row in db(
+            'explain query plan select row_id from attributes '
+            "where kind='person' and attribute='name' and value='Joe'"
+        ))
+        self.assertIn('attributes_kv', plan)
+
+    def test_migrate_on_open(self):
+        self.create_old_schema()
+        gitdata.stores.entities.EntityStore(self.db, 'person')
+        self.assertEqual(len(self.db.get_index_names('attributes')), 3)
+        self.assertEqual(len(self.db.get_index_names('entities')), 1)
+
+    def test_migrate_not_setup(self):
+        tables = self.db.get_table_names()
+        self.db.migrate()
+        self.assertFalse(self.db.migrated)
+        self.assertEqual(self.db.get_table_names(), tables)
 
 
 class TestPostgreSQLDatabase(unittest.TestCase, DatabaseTests):
@@ -2,9 +2,15 @@
     gitdata digester tests
 """
 
+import io
+import itertools
+import os
+import subprocess
+import sys
 import unittest
 
 import gitdata.digester
+from gitdata.json import dumps, events
 from gitdata.utils import test_uid_maker
 
 Digester = gitdata.digester.Digester
@@ -142,3 +148,265 @@ class TestDigester(unittest.TestCase):
         )
         facts = digested(data)
         self.assertEqual(undigested(facts), data)
+
+    def test_includes_key(self):
+        data = dict(includes='x', other=1)
+        self.assertEqual(undigested([('1', 'includes', 'x'), ('1', 'other', 1)]), data)
+        self.assertEqual(undigested(digested(data)), data)
+
+    def test_deeply_nested(self):
+        data = 'bottom'
+        for _ in range(10000):
+            data = dict(inner=[data])
+        self.assertEqual(self.digester.digest(data), '1')
+        facts = self.digester.known
+        self.assertEqual(len(facts), 20000)
+        self.assertEqual(facts[0], ('20000', 'includes', 'bottom'))
+        self.assertEqual(facts[-1], ('1', 'inner', '2'))
+
+    def test_facts_generator(self):
+        facts = self.digester.facts([dict(name='Joe'), 'x'])
+        self.assertEqual(next(facts), ('2', 'name', 'Joe'))
+        self.assertEqual(self.digester.uid, '1')
+        self.assertEqual(
+            list(facts),
+            [('1', 'includes', '2'), ('1', 'includes', 'x')]
+        )
+
+    def test_batches(self):
+        batches = list(self.digester.batches(list(range(5)), 2))
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+        self.assertEqual(batches[2], [('1', 'includes', 4)])
+
+    def test_value(self):
+        self.assertEqual(self.digester.digest('text'), 'text')
+        self.assertEqual(self.digester.known, [])
+
+    def test_parsed(self):
+        data = dict(
+            name='Joe',
+            friend=[dict(name='Adam', tags=['a', 'b']), dict(name='Jim')],
+            empty={},
+        )
+        facts = list(self.digester.parsed(events(io.StringIO(dumps(data)))))
+        self.assertEqual(facts, digested(data))
+        self.assertEqual(self.digester.roots, ['1'])
+
+    def test_parsed_lines(self):
+        text = '{"name": "Joe"}\n"text"\n[1]\n'
+        facts = list(self.digester.parsed(events(io.StringIO(text))))
+        self.assertEqual(facts, [('1', 'name', 'Joe'), ('2', 'includes', 1)])
+        self.assertEqual(self.digester.roots, ['1', 'text', '2'])
+
+
+class TestUndigester(unittest.TestCase):
+
+    def test_root_any_order(self):
+        data = [dict(name='Joe', friend=dict(name='Adam')), dict(name='Sally')]
+        facts = digested(data)
+        by_subject = sorted(facts, key=lambda fact: fact[0], reverse=True)
+        self.assertEqual(by_subject[0][0], '4')
+        self.assertEqual(undigested(by_subject), data)
+
+    def test_roots(self):
+        undigester = gitdata.digester.Undigester()
+        facts = digested(dict(a=1)) + [('9', 'b', 2)]
+        self.assertEqual(undigester.undigest(facts), dict(a=1))
+        self.assertEqual(undigester.roots, ['1', '9'])
+
+    def test_deeply_nested(self):
+        data = 'bottom'
+        for _ in range(10000):
+            data = dict(inner=[data])
+        result = undigested(digested(data))
+        depth = 0
+        while isinstance(result, dict):
+            result = result['inner'][0]
+            depth += 1
+        self.assertEqual((depth, result), (10000, 'bottom'))
+
+    def test_empty(self):
+        self.assertIsNone(undigested([]))
+
+
+class TestSharedDigester(unittest.TestCase):
+
+    def setUp(self):
+        self.digester = Digester(new_uid=test_uid_maker(), share=True)
+
+    def test_share(self):
+        address = dict(city='Vancouver', country='Canada')
+        data = [
+            dict(name='Joe', address=dict(address)),
+            dict(name='Sally', address=dict(address)),
+        ]
+        self.assertEqual(self.digester.digest(data), '1')
+        self.assertEqual(
+            self.digester.known,
+            [
+                ('2', 'name', 'Joe'),
+                ('3', 'city', 'Vancouver'),
+                ('3', 'country', 'Canada'),
+                ('2', 'address', '3'),
+                ('1', 'includes', '2'),
+                ('4', 'name', 'Sally'),
+                ('4', 'address', '3'),
+                ('1', 'includes', '4'),
+            ]
+        )
+        self.assertEqual(undigested(self.digester.known), data)
+
+    def test_share_whole_items(self):
+        data = [[1, 2], [1, 2], [2, 1], dict(a=[1, 2])]
+        self.digester.digest(data)
+        self.assertEqual(len(self.digester.known), 4 + 2 + 2 + 1)
+        self.assertEqual(undigested(self.digester.known), data)
+
+    def test_types_differ(self):
+        data = [dict(a=7), dict(a='7'), dict(a=7.0), dict(a=True)]
+        self.digester.digest(data)
+        self.assertEqual(len(self.digester.known), 8)
+        self.assertEqual(undigested(self.digester.known), data)
+
+    def test_content_hashes(self):
+        data = [dict(a=[1]), dict(a=[1]), dict(a=[2])]
+        hashes = gitdata.digester.content_hashes(data)
+        self.assertEqual(hashes[id(data[0])], hashes[id(data[1])])
+        self.assertNotEqual(hashes[id(data[0])], hashes[id(data[2])])
+        self.assertEqual(len(hashes[id(data)]), 16)
+
+
+class TestStableDigester(unittest.TestCase):
+
+    data = dict(
+        name='Joe',
+        home=dict(city='Vancouver'),
+        work=dict(city='Vancouver'),
+    )
+
+    def test_stable(self):
+        first = Digester(stable=True)
+        second = Digester(stable=True)
+        uid = first.digest(self.data)
+        self.assertEqual(len(uid), 32)
+        self.assertEqual(second.digest(dict(self.data)), uid)
+        self.assertEqual(first.known, second.known)
+        self.assertEqual(undigested(first.known), self.data)
+
+    def test_set_order(self):
+        script = (
+            'from gitdata.digester import Digester; '
+            'print(Digester(stable=True).digest('
+            '{"tags": {"alpha", "beta", "gamma", "delta"}}))'
+        )
+        uids = set()
+        for seed in ('1', '2', '3'):
+            env = dict(os.environ, PYTHONHASHSEED=seed)
+            uids.add(subprocess.check_output([sys.executable, '-c', script], env=env))
+        self.assertEqual(len(uids), 1)
+
+    def test_path(self):
+        digester = Digester(stable=True)
+        digester.digest(self.data)
+        home = [o for s, p, o in digester.known if p == 'home']
+        work = [o for s, p, o in digester.known if p == 'work']
+        self.assertNotEqual(home, work)
+
+    def test_content(self):
+        digester = Digester(stable=True)
+        uid = digester.digest(self.data)
+        self.assertNotEqual(digester.digest(dict(self.data, name='Sally')), uid)
+
+    def test_stable_share(self):
+        digester = Digester(stable=True, share=True)
+        digester.digest(self.data)
+        home = [o for s, p, o in digester.known if p == 'home']
+        work = [o for s, p, o in digester.known if p == 'work']
+        self.assertEqual(home, work)
+        self.assertEqual(len(digester.known), 4)
+
+
+class TestParallelDigester(unittest.TestCase):
+
+    data = [dict(n=n, tags=['a', str(n % 3)]) for n in range(25)]
+
+    def test_parallel_batches(self):
+        digester = Digester(share=True)
+        batches = list(digester.parallel_batches(self.data, 2, chunk_size=10))
+        self.assertEqual([len(batch) for batch in batches], [36, 36, 21])
+        facts = [fact for batch in batches for fact in batch]
+        self.assertEqual(undigested(facts), self.data)
+        self.assertEqual(len([s for s, _, _ in facts if s == digester.uid]), 25)
+
+    def test_same_as_serial(self):
+        serial = Digester(new_uid=test_uid_maker())
+        serial.digest(self.data)
+        parallel = Digester()
+        facts = [
+            fact
+            for batch in parallel.parallel_batches(self.data, 2, chunk_size=7)
+            for fact in batch
+        ]
+        self.assertEqual(len(facts), len(serial.known))
+        self.assertEqual(
+            [p for _, p, _ in facts], [p for _, p, _ in serial.known]
+        )
+
+    def test_stable_not_supported(self):
+        with self.assertRaises(Exception):
+            list(Digester(stable=True).parallel_batches(self.data))
+
+
+class TestIteratorDigester(unittest.TestCase):
+
+    def test_generator(self):
+        digester = Digester(new_uid=test_uid_maker())
+        digester.digest(dict(n=(n * 2 for n in range(3))))
+        self.assertEqual(
+            digester.known,
+            [
+                ('2', 'includes', 0),
+                ('2', 'includes', 2),
+                ('2', 'includes', 4),
+                ('1', 'n', '2'),
+            ]
+        )
+
+    def test_rows(self):
+        digester = Digester(new_uid=test_uid_maker(), rows=2)
+        data = dict(
+            counts=itertools.count(),
+            people=(dict(name='Person %d' % n) for n in itertools.count()),
+        )
+        self.assertEqual(undigested(list(digester.facts(data))), dict(
+            counts=[0, 1],
+            people=[dict(name='Person 0'), dict(name='Person 1')],
+        ))
+
+    def test_lazy(self):
+        read = []
+
+        def source():
+            for n in itertools.count():
+                read.append(n)
+                yield n
+
+        digester = Digester(rows=100)
+        facts = digester.batches(source(), 10)
+        self.assertEqual(len(next(facts)), 10)
+        self.assertLessEqual(len(read), 11)
+
+    def test_seconds(self):
+        digester = Digester(new_uid=test_uid_maker(), seconds=0.05)
+        digester.digest(itertools.count())
+        self.assertGreater(len(digester.known), 0)
+
+    def test_root_iterator(self):
+        digester = Digester(new_uid=test_uid_maker(), rows=3)
+        self.assertEqual(digester.digest(iter('abcdef')), '1')
+        self.assertEqual(undigested(digester.known), ['a', 'b', 'c'])
+
+    def test_share_refused(self):
+        digester = Digester(share=True)
+        with self.assertRaises(Exception):
+            digester.digest(dict(n=iter([1])))
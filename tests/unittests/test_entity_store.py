@@ -120,6 +120,102 @@ class TestStore(unittest.TestCase):
         person = self.people.get(al_id)
         self.assertEqual(person.done, True)
 
+    def attribute_rows(self, row_id):
+        cmd = 'select id, attribute, value from attributes where row_id=%s'
+        return {attribute: (id, value) for id, attribute, value in self.db(cmd, row_id)}
+
+    def test_put_unchanged(self):
+        before = self.attribute_rows(self.sam_id)
+        self.people.put(self.people.get(self.sam_id))
+        self.assertEqual(self.attribute_rows(self.sam_id), before)
+
+    def test_put_changed(self):
+        before = self.attribute_rows(self.sam_id)
+        sam = self.people.get(self.sam_id)
+        sam.age += 1
+        del sam['name']
+        sam.kids = 2
+        self.people.put(sam)
+        after = self.attribute_rows(self.sam_id)
+        self.assertEqual(sorted(after), ['age', 'kids'])
+        self.assertEqual(after['age'][0], before['age'][0])
+        self.assertEqual(str(after['age'][1]), '26')
+        self.assertGreater(after['kids'][0], before['age'][0])
+        sam = self.people.get(self.sam_id)
+        del sam['__store']
+        self.assertEqual(dict(sam), dict(_id=self.sam_id, age=26, kids=2))
+
+    def test_put_many(self):
+        people = [Person(name='Person %d' % n, age=n) for n in range(1000)]
+        ids = self.people.put_many(people)
+        self.assertEqual(ids, list(range(4, 1004)))
+        self.assertEqual([p._id for p in people], ids)
+        self.assertEqual(len(self.people), 1003)
+        person = self.people.get(ids[-1])
+        del person['__store']
+        self.assertEqual(dict(person), dict(_id=1003, name='Person 999', age=999))
+        self.assertEqual(self.people.put(Person(name='Al')), 1004)
+
+    def test_put_many_after_delete(self):
+        self.people.delete(self.people.put(Person(name='Al')))
+        self.assertEqual(self.people.put_many([Person(name='Bo')]), [5])
+        self.assertEqual(self.people.put(Person(name='Cy')), 6)
+        self.people.delete(6)
+        self.assertEqual(self.people.put_many([Person(name='Di')]), [7])
+
+    def test_put_many_hooks(self):
+        calls = []
+
+        class People(EntityStore):
+            def before_insert(self, record):
+                calls.append(('before', record.name))
+
+            def after_insert(self, record):
+                calls.append(('after', record._id))
+
+        people = People(self.db, Person)
+        self.assertEqual(
+            people.put_many([Person(name='Al'), Person(name='Bo')]), [4, 5]
+        )
+        self.assertEqual(
+            calls,
+            [('before', 'Al'), ('before', 'Bo'), ('after', 4), ('after', 5)]
+        )
+
+    def test_put_many_existing(self):
+        sam = self.people.get(self.sam_id)
+        sam.age = 30
+        ids = self.people.put_many([Person(name='Al'), sam])
+        self.assertEqual(ids, [4, self.sam_id])
+        self.assertEqual(self.people.get(self.sam_id).age, 30)
+        self.assertEqual(self.people.put_many([]), [])
+
+    def test_get_many_keys(self):
+        ids = self.people.put_many(Person(name=str(n)) for n in range(2000))
+        keys = list(reversed(ids)) + [5000]
+        people = self.people.get(keys)
+        self.assertEqual([p._id for p in people], keys[:-1])
+        self.assertEqual([p._id for p in self.people.get(keys[:3] * 2)], keys[:3])
+
+    def test_exists_many_keys(self):
+        ids = self.people.put_many(Person(name=str(n)) for n in range(2000))
+        self.assertEqual(self.people.exists(ids + [5000]), [True] * 2000 + [False])
+
+    def test_delete_many_keys(self):
+        ids = self.people.put_many(Person(name=str(n)) for n in range(2000))
+        self.people.delete(*ids)
+        self.assertEqual(len(self.people), 3)
+        self.assertEqual(self.people.get(ids), [])
+
+    def test_put_changed_type(self):
+        sam = self.people.get(self.sam_id)
+        sam.age = '25'
+        self.people.put(sam)
+        self.assertEqual(self.people.get(self.sam_id).age, '25')
+        sam.age = Decimal('25.0')
+        self.people.put(sam)
+        self.assertEqual(str(self.people.get(self.sam_id).age), '25.0')
+
     def test_kind(self):
         self.assertEqual(self.people.kind, 'person')
         self.assertEqual(EntityStore(self.db, TestPerson).kind, 'test_person')
@@ -265,6 +265,41 @@ class EntityStoreSuite:
             ],
         )
 
+    def test_matching_where(self):
+        store = self.store
+        store.add(self.facts)
+        self.assertEqual(
+            list(self.store.matching((None, None, None), where=[('>', 20)])),
+            [
+                ('3', 'wage', 22.1),
+            ],
+        )
+        self.assertEqual(
+            list(self.store.matching((None, 'name', None), where=[('<', 'K')])),
+            [
+                ('2', 'name', 'Joe'),
+            ],
+        )
+
+    def test_matching_any(self):
+        store = self.store
+        store.add(self.facts)
+        self.assertEqual(
+            list(self.store.matching_any((['2', '3'], ['name'], None))),
+            [
+                ('2', 'name', 'Joe'),
+                ('3', 'name', 'Sally'),
+            ],
+        )
+        self.assertEqual(
+            list(self.store.matching_any((None, None, ['2', '3']))),
+            [
+                ('1', 'includes', '2'),
+                ('1', 'includes', '3'),
+            ],
+        )
+        self.assertEqual(list(self.store.matching_any(([], None, None))), [])
+
     def test_len(self):
         store = self.store
         store.add(self.facts)
@@ -336,3 +371,113 @@ class MemoryFactStoreTests(EntityStoreSuite, unittest.TestCase):
         self.store = gitdata.stores.facts.MemoryFactStore()
         self.store.setup()
 
+
+
+class Sqlite3RecordFactStoreTests(unittest.TestCase):
+    """Sqlite3 Fact Store Record Table Tests"""
+
+    rows = [
+        ('2', ('Joe', 12)),
+        ('3', ('Sally', None)),
+        ('4', ("O'Neil", Decimal('2.5'))),
+    ]
+
+    def setUp(self):
+        self.store = gitdata.stores.facts.Sqlite3FactStore(':memory:')
+        self.store.setup()
+        self.store.add([('9', 'name', 'Pat')])
+        self.store.add_records('1', ('name', 'age'), self.rows)
+
+    def test_matching(self):
+        self.assertEqual(
+            sorted(self.store.matching((None, 'name', None))),
+            [('2', 'name', 'Joe'), ('3', 'name', 'Sally'),
+             ('4', 'name', "O'Neil"), ('9', 'name', 'Pat')]
+        )
+        self.assertEqual(list(self.store.matching(('4', 'age', None))), [('4', 'age', Decimal('2.5'))])
+        self.assertEqual(list(self.store.matching((None, None, 12))), [('2', 'age', 12)])
+        self.assertEqual(
+            list(self.store.matching(('1', None, None))),
+            [('1', 'includes', '2'), ('1', 'includes', '3'), ('1', 'includes', '4')]
+        )
+        self.assertEqual(len(self.store), 9)
+
+    def test_matching_where(self):
+        self.assertEqual(
+            list(self.store.matching((None, 'age', None), where=[('>', 3)])),
+            [('2', 'age', 12)]
+        )
+
+    def test_remove(self):
+        self.store.remove([('2', 'age', 12), ('1', 'includes', '3')])
+        self.assertEqual(list(self.store.matching(('2', None, None))), [('2', 'name', 'Joe')])
+        self.assertEqual(
+            [o for _, _, o in self.store.matching(('1', None, None))], ['2', '4']
+        )
+        self.assertEqual(len(self.store), 7)
+
+    def test_delete(self):
+        self.store.delete('4')
+        self.assertEqual(list(self.store.matching(('4', None, None))), [])
+        self.store.delete('1')
+        self.assertEqual(list(self.store.matching(('1', None, None))), [])
+        self.assertEqual(len(self.store), 4)
+
+    def test_get(self):
+        self.assertEqual(self.store.get('2'), dict(name='Joe', age=12))
+
+    def test_clear(self):
+        self.store.clear()
+        self.assertEqual(len(self.store), 0)
+        self.assertEqual(self.store._lists(), [])
+
+    def test_reopen(self):
+        with tempfile.TemporaryDirectory() as path:
+            pathname = os.path.join(path, 'facts')
+            store = gitdata.stores.facts.Sqlite3FactStore(pathname)
+            store.setup()
+            store.add_records('1', ('name',), [('2', ('Joe',))])
+            store.connection.close()
+            store = gitdata.stores.facts.Sqlite3FactStore(pathname)
+            self.assertEqual(len(store), 2)
+            store.setup()
+            self.assertEqual(len(store), 0)
+            store.connection.close()
+
+    def test_other_connection(self):
+        with tempfile.TemporaryDirectory() as path:
+            pathname = os.path.join(path, 'facts')
+            store = gitdata.stores.facts.Sqlite3FactStore(pathname)
+            store.setup()
+            other = gitdata.stores.facts.Sqlite3FactStore(pathname)
+            store.add_records('1', ('name',), [('2', ('Joe',))])
+            self.assertEqual(
+                sorted(other.matching()),
+                [('1', 'includes', '2'), ('2', 'name', 'Joe')]
+            )
+            other.connection.close()
+            other = gitdata.stores.facts.Sqlite3FactStore(pathname)
+            store.add_records('3', ('name',), [('4', ('Sam',))])
+            self.assertEqual(len(other), 4)
+            other.connection.close()
+            store.connection.close()
+
+    def test_many_lists(self):
+        attributes = ['a%d' % n for n in range(10)]
+        with tempfile.TemporaryDirectory() as path:
+            pathname = os.path.join(path, 'facts')
+            store = gitdata.stores.facts.Sqlite3FactStore(pathname)
+            store.setup()
+            for n in range(60):
+                rows = [
+                    ('%d.%d' % (n, m), tuple(range(10)))
+                    for m in range(100)
+                ]
+                store.add_records(str(n), attributes, rows)
+            store.connection.close()
+            store = gitdata.stores.facts.Sqlite3FactStore(pathname)
+            self.assertEqual(len(store), 60 * 100 * 11)
+            self.assertEqual(
+                list(store.matching(('59.99', 'a9', None))), [('59.99', 'a9', 9)]
+            )
+            store.connection.close()
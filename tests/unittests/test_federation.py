@@ -0,0 +1,64 @@
+"""
+    gitdata federation tests
+"""
+# pylint: disable=missing-docstring
+
+import os
+import tempfile
+import unittest
+
+from gitdata.federation import FederatedGraph
+from gitdata.graphs import Graph
+
+
+sources = [
+    [dict(kind='user', name='Joe'), dict(kind='user', name='Sally')],
+    [dict(kind='user', name='Pat'), dict(kind='project', name='One')],
+    [dict(kind='user', name='Sam')],
+]
+
+
+class TestFederatedGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.locations = []
+        for n, data in enumerate(sources):
+            location = os.path.join(self.directory.name, str(n))
+            os.mkdir(location)
+            graph = Graph(location)
+            graph.setup()
+            graph.add(data)
+            graph.facts.connection.close()
+            self.locations.append(location)
+        self.graph = FederatedGraph(self.locations, workers=2)
+
+    def tearDown(self):
+        self.graph.close()
+        self.directory.cleanup()
+
+    def test_query(self):
+        answer = self.graph.query([
+            ('?uid', 'kind', 'user'),
+            ('?uid', 'name', '?name'),
+        ])
+        self.assertEqual(
+            [a['name'] for a in answer], ['Joe', 'Sally', 'Pat', 'Sam']
+        )
+
+    def test_query_where(self):
+        answer = self.graph.query(
+            [('?uid', 'name', '?name')],
+            where=[('?name', '>', 'Pat')],
+        )
+        self.assertEqual(sorted(a['name'] for a in answer), ['Sally', 'Sam'])
+
+    def test_query_limit(self):
+        answer = self.graph.query([('?uid', 'kind', 'user')], limit=3)
+        self.assertEqual(len(answer), 3)
+
+    def test_context_manager(self):
+        with FederatedGraph(self.locations[:1]) as graph:
+            self.assertEqual(len(graph.query([('?uid', 'kind', '?kind')])), 2)
+        self.assertIsNone(graph.executor)
+
@@ -6,10 +6,13 @@
 import datetime
 from decimal import Decimal
 import io
+import json
+import tempfile
 
 import unittest
 
-from gitdata.graphs import Graph
+from gitdata.connectors.common import get
+from gitdata.graphs import Graph, Rule
 from gitdata.utils import test_uid_maker
 
 data = [
@@ -346,6 +349,260 @@ class GraphTestsPreloaded(unittest.TestCase):
         answer = g.find(kind='animal')
         self.assertEqual(answer, [])
 
+    def test_neighbors(self):
+        g = self.graph
+        self.assertEqual(g.neighbors(['2', '6']), ['3', '7'])
+        self.assertEqual(g.neighbors('3', predicates=['includes']), ['4', '5'])
+        self.assertEqual(g.neighbors('4', reverse=True), ['3'])
+
+    def test_traverse(self):
+        g = self.graph
+        self.assertEqual(len(g.traverse('2', depth=0)), 1)
+        self.assertEqual(len(g.traverse('2', depth=1)), 3)
+        self.assertEqual(len(g.traverse('2', depth=2)), 9)
+        self.assertEqual(len(g.traverse('1')), 20)
+        subgraph = g.traverse('1', predicates=['projects', 'includes'])
+        self.assertEqual(
+            sorted(r['name'] for r in subgraph.query([('?uid', 'name', '?name')])),
+            ['Project One', 'Project Two']
+        )
+
+    def test_path(self):
+        g = self.graph
+        self.assertEqual(g.path('1', '8'), ['1', '6', '7', '8'])
+        self.assertEqual(g.path('8', '1', reverse=True), ['8', '7', '6', '1'])
+        self.assertEqual(g.path('1', '1'), ['1'])
+        self.assertIsNone(g.path('4', '8'))
+
+    def test_explain(self):
+        report = self.graph.explain([
+            ('?uid', 'name', '?name'),
+            ('?uid', 'kind', 'user'),
+        ])
+        self.assertEqual(len(report['steps']), 2)
+        self.assertEqual(report['steps'][0]['binds'], ['?uid', '?name'])
+        self.assertEqual(report['steps'][1]['joins'], ['?uid'])
+        self.assertNotIn('results', report)
+
+    def test_explain_profile(self):
+        report = self.graph.explain(
+            [
+                ('?uid', 'name', '?name'),
+                ('?uid', 'kind', 'user'),
+            ],
+            where=[('?name', '<', 'S')],
+            profile=True,
+        )
+        first, second = report['steps']
+        self.assertEqual(first['pushed'], [('<', 'S')])
+        self.assertEqual((first['rows'], first['bindings']), (3, 3))
+        self.assertEqual((second['rows'], second['bindings']), (2, 1))
+        self.assertEqual(report['results'], 1)
+        self.assertGreaterEqual(second['matching'], 0)
+        self.assertGreaterEqual(report['elapsed'], 0)
+
+    def test_prepare(self):
+        g = self.graph
+        query = g.prepare([
+            ('?uid', 'name', '?name'),
+            ('?uid', 'kind', '$kind'),
+        ])
+        self.assertEqual(query.parameters, ['kind'])
+        self.assertEqual(query(kind='user'), [
+            {'uid': '4', 'name': 'Joe'},
+            {'uid': '5', 'name': 'Sally'}
+        ])
+        self.assertEqual(query(kind='project'), [
+            {'uid': '8', 'name': 'Project One'},
+            {'uid': '9', 'name': 'Project Two'}
+        ])
+        self.assertEqual(query(kind='animal'), [])
+
+    def test_prepare_missing_parameter(self):
+        query = self.graph.prepare([('?uid', 'kind', '$kind')])
+        with self.assertRaises(Exception):
+            query()
+
+    def test_prepare_cache(self):
+        g = self.graph
+        query = g.prepare([
+            ('?uid', 'name', '?name'),
+            ('?uid', 'kind', '$kind'),
+        ])
+        self.assertEqual(len(query(kind='user')), 2)
+        self.assertEqual(len(query.cache), 1)
+        query(kind='user')[0]['name'] = 'Changed'
+        self.assertEqual(query(kind='user')[0]['name'], 'Joe')
+        g.add(dict(kind='user', name='Pat'))
+        self.assertEqual(len(query.cache), 1)
+        self.assertEqual(len(query(kind='user')), 3)
+
+    def test_prepare_cache_size(self):
+        query = self.graph.prepare([('?uid', 'kind', '$kind')])
+        query.cache_size = 2
+        query(kind='user')
+        query(kind='project')
+        query(kind='user')
+        query(kind='animal')
+        self.assertEqual(
+            list(query.cache), [(('kind', 'user'),), (('kind', 'animal'),)]
+        )
+
+    def test_add_batches(self):
+        g = Graph()
+        g.setup()
+        batches = []
+        insert = g.insert
+        g.insert = lambda facts: batches.append(len(facts)) or insert(facts)
+        uid = g.add(data, batch_size=8)
+        self.assertEqual(batches, [8, 8, 4])
+        self.assertEqual(g.node(uid), data)
+
+    def test_ingest(self):
+        g = Graph()
+        g.setup()
+        with open('examples/miserables.json') as stream:
+            uids = g.ingest(stream, batch_size=100)
+        with open('examples/miserables.json') as stream:
+            expected = json.load(stream)
+        self.assertEqual(len(uids), 1)
+        self.assertEqual(g.node(uids[0]), expected)
+
+    def test_ingest_unknown_type(self):
+        g = Graph()
+        g.setup()
+        data = [{'__type__': 'Feature', 'id': 1}]
+        uids = g.ingest(io.StringIO(json.dumps(data)))
+        self.assertEqual(g.node(uids[0]), data)
+
+    def test_add_share(self):
+        g = Graph()
+        g.setup()
+        rows = [dict(kind='score', team='red', points=3)] * 50
+        uid = g.add(rows, share=True)
+        self.assertEqual(len(g), 53)
+        self.assertEqual(g.node(uid), rows)
+
+    def test_add_stable(self):
+        g = Graph()
+        g.setup()
+        uid = g.add(data, stable=True)
+        self.assertEqual(len(g), 20)
+        self.assertEqual(g.add(data, stable=True, batch_size=3), uid)
+        self.assertEqual(len(g), 20)
+        g.add(dict(values=[1, 1, None]), stable=True)
+        g.add(dict(values=[1, 1, None]), stable=True)
+        self.assertEqual(len(g), 23)
+
+    def test_add_stable_changed(self):
+        g = Graph()
+        g.setup()
+        g.add(dict(pulled=1, data=data), stable=True)
+        self.assertEqual(len(g), 22)
+        g.add(dict(pulled=2, data=data), stable=True)
+        self.assertEqual(len(g), 24)
+
+    def test_load(self):
+        g = self.graph
+        self.assertEqual(g.load('1'), data)
+        self.assertEqual(g.load('3'), data[0]['users'])
+        self.assertIsNone(g.load('missing'))
+
+    def test_load_depth(self):
+        g = self.graph
+        self.assertEqual(g.load('1', depth=0), ['2', '6'])
+        self.assertEqual(g.load('1', depth=1), [dict(users='3'), dict(projects='7')])
+        self.assertEqual(g.load('1', depth=3), data)
+
+    def test_load_lookups(self):
+        g = self.graph
+        calls = []
+        matching_any = g.facts.matching_any
+        g.facts.matching_any = lambda *a: calls.append(a) or matching_any(*a)
+        try:
+            g.load('6')
+        finally:
+            del g.facts.matching_any
+        self.assertEqual(len(calls), 4)
+
+    def test_add_workers(self):
+        g = Graph()
+        g.setup()
+        rows = [dict(kind='score', points=n) for n in range(30)]
+        uid = g.add(rows, batch_size=8, workers=2)
+        self.assertEqual(len(g), 90)
+        self.assertEqual(g.load(uid), rows)
+
+    def test_add_fake_connector(self):
+        g = Graph()
+        g.setup()
+        uid = g.add(get('fake'), rows=5)
+        fake = g.load(uid)
+        self.assertEqual(len(fake['people']), 5)
+        self.assertEqual(len(fake['addresses']), 5)
+        self.assertEqual(len(fake['locations']), 5)
+        self.assertEqual(
+            sorted(fake['people'][0]), ['birthdate', 'first_name', 'last_name', 'sex']
+        )
+
+    def test_query_limit(self):
+        answer = self.graph.query([('?uid', 'kind', '?kind')], limit=3)
+        self.assertEqual(len(answer), 3)
+
+    def test_query_dollar_constant(self):
+        g = self.graph
+        g.add(dict(kind='price', amount='$5'))
+        self.assertEqual(
+            len(g.query([('?uid', 'amount', '$5')])), 1
+        )
+
+    def test_node(self):
+        g = self.graph
+        root = g.node('1')
+        self.assertTrue(root.is_list)
+        users = root[0].users
+        self.assertEqual([user.name for user in users], ['Joe', 'Sally'])
+        self.assertEqual(users[1]['birthdate'], datetime.date(1991, 1, 2))
+        self.assertEqual(dict(g.node('4')), dict(
+            kind='user',
+            name='Joe',
+            birthdate=datetime.date(1991, 1, 2),
+        ))
+        self.assertEqual(g.node('2'), dict(users=[
+            dict(kind='user', name='Joe', birthdate=datetime.date(1991, 1, 2)),
+            dict(kind='user', name='Sally', birthdate=datetime.date(1991, 1, 2)),
+        ]))
+        self.assertIsNone(g.node('4').missing)
+        with self.assertRaises(KeyError):
+            g.node('4')['missing']
+
+    def test_node_add(self):
+        g = self.graph
+        node = g.node('8')
+        node.add('status', 'draft')
+        uid = node.add('cities', ['Vancouver', 'Victoria'])
+        self.assertEqual(node.status, 'draft')
+        self.assertEqual(list(node.cities), ['Vancouver', 'Victoria'])
+        self.assertEqual(g.node(uid), ['Vancouver', 'Victoria'])
+
+    def test_find_prefetch(self):
+        g = self.graph
+        lookups = []
+        matching_any = g.facts.matching_any
+
+        def counted(pattern):
+            lookups.append(pattern)
+            return matching_any(pattern)
+
+        g.facts.matching_any = counted
+        holders = g.find('projects', prefetch=['projects'])
+        self.assertEqual(len(lookups), 4)
+        names = [project.name for holder in holders for project in holder.projects]
+        self.assertEqual(names, ['Project One', 'Project Two'])
+        created = [project.created for holder in holders for project in holder.projects]
+        self.assertEqual(len(created), 2)
+        self.assertEqual(len(lookups), 4)
+
     # def test_iter_node_list(self):
     #     users = self.graph.get('2')
     #     print(users)
@@ -365,3 +622,519 @@ class GraphTestsPreloaded(unittest.TestCase):
     #     )
 
 
+scores = [
+    dict(kind='score', team='red', points=3),
+    dict(kind='score', team='blue', points=5),
+    dict(kind='score', team='red', points=4),
+]
+
+
+class GraphAggregateSuite:
+    """Graph Aggregation Tests"""
+
+    def test_count(self):
+        answer = self.graph.aggregate(
+            [('?uid', 'kind', '?kind')],
+            group_by=['?kind'],
+            n=('count', '?uid'),
+        )
+        self.assertEqual(
+            sorted(answer, key=lambda a: a['kind']),
+            [
+                {'kind': 'project', 'n': 2},
+                {'kind': 'score', 'n': 3},
+                {'kind': 'user', 'n': 2},
+            ]
+        )
+
+    def test_sum_by_group(self):
+        answer = self.graph.aggregate(
+            [
+                ('?uid', 'team', '?team'),
+                ('?uid', 'points', '?points'),
+            ],
+            group_by=['?team'],
+            total=('sum', '?points'),
+            best=('max', '?points'),
+        )
+        self.assertEqual(
+            sorted(answer, key=lambda a: a['team']),
+            [
+                {'team': 'blue', 'total': 5, 'best': 5},
+                {'team': 'red', 'total': 7, 'best': 4},
+            ]
+        )
+
+    def test_min_max(self):
+        answer = self.graph.aggregate(
+            [
+                ('?uid', 'kind', 'project'),
+                ('?uid', 'created', '?created'),
+            ],
+            first=('min', '?created'),
+            last=('max', '?created'),
+            n=('count', None),
+        )
+        self.assertEqual(answer, {
+            'first': datetime.datetime(2019, 5, 2),
+            'last': datetime.datetime(2019, 5, 3),
+            'n': 2,
+        })
+
+    def test_mixed_types(self):
+        self.graph.add([
+            dict(kind='sample', n=1),
+            dict(kind='sample', n=2.5),
+            dict(kind='sample', n='abc'),
+        ])
+        answer = self.graph.aggregate(
+            [
+                ('?uid', 'kind', 'sample'),
+                ('?uid', 'n', '?n'),
+            ],
+            total=('sum', '?n'),
+            lo=('min', '?n'),
+            hi=('max', '?n'),
+        )
+        self.assertEqual(answer, {'total': 3.5, 'lo': 1, 'hi': 'abc'})
+        self.assertEqual(type(answer['total']), float)
+        self.assertEqual(type(answer['lo']), int)
+
+    def test_mixed_numbers(self):
+        self.graph.add([
+            dict(kind='sample', n=1),
+            dict(kind='sample', n=2.5),
+        ])
+        answer = self.graph.aggregate(
+            [
+                ('?uid', 'kind', 'sample'),
+                ('?uid', 'n', '?n'),
+            ],
+            total=('sum', '?n'),
+            lo=('min', '?n'),
+            hi=('max', '?n'),
+        )
+        self.assertEqual(answer, {'total': 3.5, 'lo': 1, 'hi': 2.5})
+        self.assertEqual(
+            [type(answer[k]) for k in ('total', 'lo', 'hi')], [float, int, float]
+        )
+
+    def test_sum_decimals(self):
+        self.graph.add([
+            dict(kind='sample', group='a', n=Decimal('0.1')),
+            dict(kind='sample', group='a', n=Decimal('0.2')),
+            dict(kind='sample', group='b', n=Decimal('0.1')),
+            dict(kind='sample', group='b', n=2),
+        ])
+        answer = self.graph.aggregate(
+            [
+                ('?uid', 'group', '?group'),
+                ('?uid', 'n', '?n'),
+            ],
+            group_by=['?group'],
+            total=('sum', '?n'),
+        )
+        self.assertEqual(
+            sorted(answer, key=lambda a: a['group']),
+            [
+                {'group': 'a', 'total': Decimal('0.3')},
+                {'group': 'b', 'total': Decimal('2.1')},
+            ]
+        )
+        self.assertEqual(
+            [str(a['total']) for a in sorted(answer, key=lambda a: a['group'])],
+            ['0.3', '2.1']
+        )
+
+    def test_empty(self):
+        answer = self.graph.aggregate(
+            [('?uid', 'kind', 'animal')],
+            n=('count', '?uid'),
+            total=('sum', '?uid'),
+        )
+        self.assertEqual(answer, {'n': 0, 'total': None})
+
+    def test_unsupported(self):
+        with self.assertRaises(Exception):
+            self.graph.aggregate(
+                [('?uid', 'kind', '?kind')],
+                n=('median', '?uid'),
+            )
+
+
+class GraphFilterSuite:
+    """Graph Query Filter Tests"""
+
+    def test_filter_object(self):
+        answer = self.graph.query(
+            [
+                ('?uid', 'kind', 'project'),
+                ('?uid', 'created', '?created'),
+                ('?uid', 'name', '?name'),
+            ],
+            where=[('?created', '>', datetime.date(2019, 5, 2))]
+        )
+        self.assertEqual([a['name'] for a in answer], ['Project Two'])
+
+    def test_filter_between(self):
+        answer = self.graph.query(
+            [('?uid', 'points', '?points')],
+            where=[('?points', 'between', (4, 5))]
+        )
+        self.assertEqual(sorted(a['points'] for a in answer), [4, 5])
+
+    def test_filter_in(self):
+        answer = self.graph.query(
+            [('?uid', 'name', '?name')],
+            where=[('?name', 'in', ['Joe', 'Sally', 'Pat'])]
+        )
+        self.assertEqual(sorted(a['name'] for a in answer), ['Joe', 'Sally'])
+
+    def test_filter_not_equal(self):
+        answer = self.graph.query(
+            [('?uid', 'kind', '?kind')],
+            where=[('?kind', '!=', 'score')]
+        )
+        self.assertEqual(len(answer), 4)
+
+    def test_filter_mismatched_types(self):
+        answer = self.graph.query(
+            [('?uid', 'name', '?name')],
+            where=[('?name', '>', 5)]
+        )
+        self.assertEqual(answer, [])
+
+    def test_filter_subject(self):
+        answer = self.graph.query(
+            [('?uid', 'points', '?points')],
+            where=[('?uid', 'in', ['11', '12'])]
+        )
+        self.assertEqual(len(answer), 2)
+
+    def test_filter_unknown_variable(self):
+        with self.assertRaises(Exception):
+            self.graph.query(
+                [('?uid', 'points', '?points')],
+                where=[('?age', '>', 5)]
+            )
+
+    def test_filter_parameter(self):
+        query = self.graph.prepare(
+            [('?uid', 'points', '?points')],
+            where=[('?points', '>=', '$least')]
+        )
+        self.assertEqual(len(query(least=4)), 2)
+        self.assertEqual(len(query(least=5)), 1)
+
+    def test_filter_aggregate(self):
+        answer = self.graph.aggregate(
+            [('?uid', 'points', '?points')],
+            where=[('?points', '<', 5)],
+            total=('sum', '?points'),
+        )
+        self.assertEqual(answer, {'total': 7})
+
+
+class GraphViewSuite:
+    """Graph Materialized View Tests"""
+
+    team_points = [
+        ('?uid', 'team', '?team'),
+        ('?uid', 'points', '?points'),
+    ]
+
+    def assertFresh(self, name, clauses, where=None):
+        expected = self.graph.query(clauses, where=where)
+        self.assertEqual(
+            sorted(self.graph.view(name), key=repr),
+            sorted(expected, key=repr)
+        )
+
+    def test_view(self):
+        self.graph.create_view('points', self.team_points)
+        self.assertEqual(len(self.graph.view('points')), 3)
+        self.assertFresh('points', self.team_points)
+
+    def test_view_add(self):
+        self.graph.create_view('points', self.team_points)
+        self.graph.add([
+            dict(kind='score', team='blue', points=1),
+            dict(kind='score', team='green', points=2),
+        ])
+        self.assertEqual(len(self.graph.view('points')), 5)
+        self.assertFresh('points', self.team_points)
+
+    def test_view_delete(self):
+        self.graph.create_view('points', self.team_points)
+        self.graph.delete((None, 'points', 5))
+        self.assertEqual(
+            sorted(row['points'] for row in self.graph.view('points')), [3, 4]
+        )
+        self.assertFresh('points', self.team_points)
+
+    def test_view_remove_duplicate(self):
+        clauses = [('?uid', 'p', '?value')]
+        self.graph.create_view('duplicates', clauses)
+        self.graph.insert([('d', 'p', 'e'), ('d', 'p', 'e')])
+        self.graph.remove([('d', 'p', 'e')])
+        self.assertEqual(len(list(self.graph.facts.matching(('d', 'p', 'e')))), 1)
+        self.assertEqual(self.graph.view('duplicates'), [{'uid': 'd', 'value': 'e'}])
+        self.assertFresh('duplicates', clauses)
+        self.graph.remove([('d', 'p', 'e')])
+        self.assertEqual(self.graph.view('duplicates'), [])
+        self.assertFresh('duplicates', clauses)
+
+    def test_view_remove_record(self):
+        self.graph.create_view('points', self.team_points)
+        fact = list(self.graph.facts.matching((None, 'points', 5)))[0]
+        self.graph.remove([fact])
+        self.assertEqual(
+            sorted(row['points'] for row in self.graph.view('points')), [3, 4]
+        )
+        self.assertFresh('points', self.team_points)
+
+    def test_view_node_add(self):
+        clauses = [('?uid', 'kind', 'user'), ('?uid', 'name', '?name')]
+        self.graph.create_view('users', clauses)
+        self.graph.node('4').add('name', 'Joseph')
+        self.assertEqual(
+            sorted(row['name'] for row in self.graph.view('users')),
+            ['Joe', 'Joseph', 'Sally']
+        )
+        self.assertFresh('users', clauses)
+
+    def test_view_where(self):
+        where = [('?points', '>', 3)]
+        self.graph.create_view('high', self.team_points, where=where)
+        self.graph.add(dict(team='blue', points=2))
+        self.graph.add(dict(team='blue', points=7))
+        self.graph.delete((None, 'points', 4))
+        self.assertFresh('high', self.team_points, where=where)
+        self.assertEqual(
+            sorted(row['points'] for row in self.graph.view('high')), [5, 7]
+        )
+
+    def test_view_unrelated_change(self):
+        self.graph.create_view('points', self.team_points)
+        facts = self.graph.facts
+        calls = []
+        matching_any = facts.matching_any
+        facts.matching_any = lambda *a: calls.append(a) or matching_any(*a)
+        try:
+            self.graph.add(dict(kind='user', name='Pat'))
+        finally:
+            del facts.matching_any
+        self.assertEqual(calls, [])
+        self.assertEqual(len(self.graph.view('points')), 3)
+
+    def test_view_clear(self):
+        self.graph.create_view('points', self.team_points)
+        self.graph.clear()
+        self.assertEqual(self.graph.view('points'), [])
+
+    def test_drop_view(self):
+        self.graph.create_view('points', self.team_points)
+        self.graph.drop_view('points')
+        with self.assertRaises(KeyError):
+            self.graph.view('points')
+
+
+class GraphInferSuite:
+    """Graph Rule Inference Tests"""
+
+    parents = [
+        ('p1', 'parent', 'p2'),
+        ('p2', 'parent', 'p3'),
+        ('p3', 'parent', 'p4'),
+        ('p5', 'parent', 'p3'),
+    ]
+
+    ancestry = [
+        Rule(('?a', 'ancestor', '?b'), [('?a', 'parent', '?b')]),
+        Rule(('?a', 'ancestor', '?c'), [
+            ('?a', 'parent', '?b'),
+            ('?b', 'ancestor', '?c'),
+        ]),
+    ]
+
+    def ancestors(self):
+        return sorted(
+            (a['a'], a['b'])
+            for a in self.graph.query([('?a', 'ancestor', '?b')])
+        )
+
+    def test_infer(self):
+        self.graph.insert(self.parents)
+        self.assertEqual(self.graph.infer(self.ancestry), 8)
+        self.assertEqual(self.ancestors(), [
+            ('p1', 'p2'), ('p1', 'p3'), ('p1', 'p4'),
+            ('p2', 'p3'), ('p2', 'p4'),
+            ('p3', 'p4'),
+            ('p5', 'p3'), ('p5', 'p4'),
+        ])
+
+    def test_infer_nothing_new(self):
+        self.graph.insert(self.parents)
+        self.graph.infer(self.ancestry)
+        self.assertEqual(self.graph.infer(self.ancestry), 0)
+
+    def test_infer_batches(self):
+        self.graph.insert(self.parents)
+        batches = []
+        insert = self.graph.insert
+        self.graph.insert = lambda facts: batches.append(len(facts)) or insert(facts)
+        self.graph.infer(self.ancestry, batch_size=2)
+        self.assertEqual(batches, [2, 2, 2, 1, 1])
+
+    def test_infer_where(self):
+        rule = Rule(
+            ('?uid', 'rank', 'high'),
+            [('?uid', 'points', '?points')],
+            where=[('?points', '>', 3)],
+        )
+        self.assertEqual(self.graph.infer([rule]), 2)
+        self.assertEqual(len(self.graph.find(rank='high')), 2)
+
+    def test_infer_unbound(self):
+        with self.assertRaises(Exception):
+            Rule(('?a', 'ancestor', '?c'), [('?a', 'parent', '?b')])
+
+
+class GraphDiffSuite:
+    """Graph Diff and Merge Tests"""
+
+    def copy(self):
+        other = self.new_graph()
+        other.insert(self.graph.facts.matching((None, None, None)))
+        return other
+
+    def test_diff_same(self):
+        self.assertEqual(list(self.graph.diff(self.copy())), [])
+
+    def test_diff(self):
+        other = self.copy()
+        other.delete((None, 'points', 5))
+        other.insert([('12', 'points', 6), ('20', 'name', 'Pat')])
+        self.assertEqual(list(self.graph.diff(other)), [
+            ('-', ('12', 'points', 5)),
+            ('+', ('12', 'points', 6)),
+            ('+', ('20', 'name', 'Pat')),
+        ])
+        self.assertEqual(list(other.diff(self.graph)), [
+            ('+', ('12', 'points', 5)),
+            ('-', ('12', 'points', 6)),
+            ('-', ('20', 'name', 'Pat')),
+        ])
+
+    def test_diff_mixed_types(self):
+        other = self.copy()
+        other.insert([
+            ('4', 'tag', 'x'),
+            ('4', 'tag', 2),
+            ('4', 'tag', datetime.date(2020, 1, 1)),
+        ])
+        self.assertEqual(
+            [fact for change, fact in self.graph.diff(other) if change == '+'],
+            [fact for change, fact in other.diff(self.graph) if change == '-'],
+        )
+        self.assertEqual(len(list(self.graph.diff(other))), 3)
+
+    def test_merge(self):
+        other = self.new_graph()
+        other.insert([('4', 'name', 'Joe'), ('4', 'age', 30)])
+        self.assertEqual(self.graph.merge(other, batch_size=1), 1)
+        self.assertEqual(self.graph.first(name='Joe')['age'], 30)
+        self.assertEqual(self.graph.merge(other), 0)
+        self.assertEqual(
+            [change for change, _ in self.graph.diff(other)],
+            ['-'] * (len(self.graph.facts) - 2)
+        )
+
+
+class MemoryGraphQueryTests(
+        GraphAggregateSuite, GraphFilterSuite, GraphViewSuite, GraphInferSuite,
+        GraphDiffSuite, unittest.TestCase):
+
+    def setUp(self):
+        self.graph = Graph(new_uid=test_uid_maker())
+        self.graph.clear()
+        self.graph.add(data)
+        self.graph.add(scores)
+
+    def new_graph(self):
+        graph = Graph()
+        graph.setup()
+        return graph
+
+
+class Sqlite3GraphQueryTests(
+        GraphAggregateSuite, GraphFilterSuite, GraphViewSuite, GraphInferSuite,
+        GraphDiffSuite, unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.graph = Graph(self.directory.name, new_uid=test_uid_maker())
+        self.graph.setup()
+        self.graph.add(data)
+        self.graph.add(scores)
+        self.graphs = [self.graph]
+
+    def new_graph(self):
+        directory = tempfile.mkdtemp(dir=self.directory.name)
+        graph = Graph(directory)
+        graph.setup()
+        self.graphs.append(graph)
+        return graph
+
+    def tearDown(self):
+        for graph in self.graphs:
+            graph.facts.connection.close()
+        self.directory.cleanup()
+
+    def test_prepare_cache_other_connection(self):
+        query = self.graph.prepare([('?uid', 'kind', '$kind')])
+        self.assertEqual(len(query(kind='user')), 2)
+        other = Graph(self.directory.name)
+        self.graphs.append(other)
+        other.add(dict(kind='user', name='Pat'))
+        self.assertEqual(len(query(kind='user')), 3)
+
+
+    def test_add_stable_stored_values(self):
+        g = self.new_graph()
+        row = dict(
+            total=0.1 + 0.2,
+            when=datetime.datetime(2020, 1, 2, 3, 4, 5, 678901),
+            scores=[0.1 + 0.2, 0.1 + 0.2],
+        )
+        g.add(row, stable=True)
+        self.assertEqual(len(g), 5)
+        g.add(row, stable=True)
+        self.assertEqual(len(g), 5)
+
+
+class Sqlite3RecordGraphQueryTests(Sqlite3GraphQueryTests):
+    """Run the query tests with record lists stored as tables"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.graph = Graph(self.directory.name, new_uid=test_uid_maker())
+        self.graph.setup()
+        self.graph.facts.min_records = 2
+        self.graph.add(data)
+        self.graph.add(scores)
+        self.graphs = [self.graph]
+
+    def test_tables(self):
+        self.assertEqual(
+            self.graph.facts._lists(),
+            [
+                ('3', ['kind', 'name', 'birthdate']),
+                ('7', ['kind', 'name', 'created']),
+                ('10', ['kind', 'team', 'points']),
+            ]
+        )
+        self.assertEqual(len(self.graph), 32)
+        self.assertEqual(self.graph.load('1'), data)
+        self.assertEqual(self.graph.load('10'), scores)
+
@@ -2,11 +2,12 @@
     Test the gdjson module
 """
 
+import io
 import unittest
 import datetime
 from decimal import Decimal
 
-from gitdata.json import loads, dumps
+from gitdata.json import loads, dumps, events
 
 
 class TestConvert(unittest.TestCase):
@@ -71,3 +72,100 @@ class TestConvert(unittest.TestCase):
     def test_error(self):
         d = [Decimal('22.32'), self]
         self.assertRaises(TypeError, dumps, d)
+
+
+def build(stream):
+    """rebuild values from parse events"""
+    values, stack, keys = [], [], []
+    for kind, value in stream:
+        if kind == 'map_key':
+            keys[-1] = value
+            continue
+        if kind in ('end_map', 'end_array'):
+            value = stack.pop()
+            keys.pop()
+        elif kind in ('start_map', 'start_array'):
+            stack.append({} if kind == 'start_map' else [])
+            keys.append(None)
+            continue
+        if len(stack) == 0:
+            values.append(value)
+        elif isinstance(stack[-1], dict):
+            stack[-1][keys[-1]] = value
+        else:
+            stack[-1].append(value)
+    return values
+
+
+class TestEvents(unittest.TestCase):
+
+    data = dict(
+        name='Joe \u00e9 "quoted" \\ text',
+        scores=[1, -2.5, 3e10, True, False, None],
+        nested=[dict(a=[]), {}, [[1], [2, [3]]]],
+        when=datetime.datetime(2020, 1, 1, 2, 2, 2),
+        amount=Decimal('22.32'),
+        count=12345678901234567890,
+    )
+
+    def test_events(self):
+        self.assertEqual(
+            list(events(io.StringIO('{"a": [1, {"b": null}], "c": "d"}'))),
+            [
+                ('start_map', None),
+                ('map_key', 'a'),
+                ('start_array', None),
+                ('value', 1),
+                ('start_map', None),
+                ('map_key', 'b'),
+                ('value', None),
+                ('end_map', None),
+                ('end_array', None),
+                ('map_key', 'c'),
+                ('value', 'd'),
+                ('end_map', None),
+            ]
+        )
+
+    def test_small_reads(self):
+        text = dumps(self.data)
+        for size in (1, 2, 3, 7, 64):
+            self.assertEqual(
+                build(events(io.StringIO(text), size=size)),
+                [loads(text)]
+            )
+
+    def test_typed_values(self):
+        self.assertEqual(
+            build(events(io.StringIO(dumps([self.data['when']])), size=5)),
+            [[self.data['when']]]
+        )
+
+    def test_unknown_typed_objects(self):
+        text = '[{"__type__": "Feature", "id": 1}, {"__type__": "date", "value": "2020-01-02"}]'
+        self.assertEqual(list(events(io.StringIO(text)))[:6], [
+            ('start_array', None),
+            ('start_map', None),
+            ('map_key', '__type__'),
+            ('value', 'Feature'),
+            ('map_key', 'id'),
+            ('value', 1),
+        ])
+        self.assertEqual(build(events(io.StringIO(text), size=3)), [loads(text)])
+
+    def test_json_lines(self):
+        text = '{"a": 1}\n{"a": 2}\n3\n'
+        self.assertEqual(build(events(io.StringIO(text))), [{'a': 1}, {'a': 2}, 3])
+
+    def test_empty(self):
+        self.assertEqual(list(events(io.StringIO(''))), [])
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            list(events(io.StringIO('{"a": tru')))
+        with self.assertRaises(ValueError):
+            list(events(io.StringIO('[1, 2}')))
+        for text in ('[1 2 3]', '{"a" "b"}', '{"a": 1 "b": 2}', '[1,,2]',
+                     '[1,]', '{"a": 1,}', '{1: 2}', '[,]', '[1', '{"a"'):
+            with self.assertRaises(ValueError, msg=text):
+                list(events(io.StringIO(text)))
@@ -21,6 +21,17 @@ class RepositorySuite:
         self.repository.fetch(pathname)
         self.assertEqual(len(self.repository.graph.facts), 10)
 
+    def test_fetch_fake(self):
+        self.repository.fetch('fake', rows=3)
+        result = self.repository.graph.facts.matching((None, 'first_name', None))
+        self.assertEqual(len(list(result)), 3)
+
+    def test_fetch_fake_default_budget(self):
+        self.repository.fetch_rows = 5
+        self.repository.fetch('fake')
+        result = self.repository.graph.facts.matching((None, 'first_name', None))
+        self.assertEqual(len(list(result)), 5)
+
     def test_facts(self):
         pathname = 'examples/miserables.json'
         self.assertTrue(os.path.isfile(pathname))